@@ -0,0 +1,32 @@
+"""
+Shared Anthropic Client
+One AsyncAnthropic client (and one HTTP connection pool) for every component
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_async_client = None
+_async_initialized = False
+
+
+def get_async_anthropic_client():
+    """
+    The process-wide AsyncAnthropic client, created on first use
+
+    Used from async code so LLM calls don't block the event loop.
+    Returns None if ANTHROPIC_API_KEY is unset or the SDK is unavailable.
+    """
+    global _async_client, _async_initialized
+    if not _async_initialized:
+        _async_initialized = True
+        anthropic_key = os.getenv('ANTHROPIC_API_KEY')
+        if anthropic_key:
+            try:
+                from anthropic import AsyncAnthropic
+                _async_client = AsyncAnthropic(api_key=anthropic_key)
+            except Exception as e:
+                logger.warning(f"AsyncAnthropic init failed: {e}")
+    return _async_client
@@ -0,0 +1,38 @@
+"""
+Cached Wall Clock
+One ISO timestamp string refreshed by a background task, for the per-turn
+timestamps (history entries, session saves) that don't need sub-tick precision
+"""
+
+import asyncio
+from datetime import datetime
+
+# Refresh interval of the cached timestamp (seconds)
+CLOCK_TICK = 0.05
+
+_now_iso = datetime.now().isoformat(timespec='milliseconds')
+_ticking = False
+
+
+def now_iso() -> str:
+    """
+    The current local time in ISO 8601 (milliseconds)
+
+    At most CLOCK_TICK old while run_clock() is running; formatted on the
+    spot otherwise (scripts, tests), so it is never stale.
+    """
+    if _ticking:
+        return _now_iso
+    return datetime.now().isoformat(timespec='milliseconds')
+
+
+async def run_clock():
+    """Keep the cached timestamp current - run as a task for the app's lifetime"""
+    global _now_iso, _ticking
+    _ticking = True
+    try:
+        while True:
+            _now_iso = datetime.now().isoformat(timespec='milliseconds')
+            await asyncio.sleep(CLOCK_TICK)
+    finally:
+        _ticking = False
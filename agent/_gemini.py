@@ -0,0 +1,36 @@
+"""
+Shared Gemini Clients
+One google.genai Client (and one HTTP connection pool) for every component,
+and reused GenerativeModel objects for the legacy SDK
+"""
+
+import logging
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_genai_client(api_key: str):
+    """
+    The process-wide google.genai Client, created on first use
+
+    Sharing it keeps connections to the API alive across detector,
+    extractor and orchestrator calls instead of one pool per component.
+    Raises ImportError if google-genai is not installed.
+    """
+    global _client
+    if _client is None:
+        from google import genai
+        _client = genai.Client(api_key=api_key)
+    return _client
+
+
+@lru_cache(maxsize=64)
+def get_legacy_model(model_name: str, system: Optional[str] = None, temperature: Optional[float] = None):
+    """A google.generativeai GenerativeModel, built once per configuration"""
+    import google.generativeai as genai
+    generation_config = {"temperature": temperature} if temperature is not None else None
+    return genai.GenerativeModel(model_name, system_instruction=system, generation_config=generation_config)
@@ -7,7 +7,7 @@ import asyncio
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 from pydantic import BaseModel, Field, HttpUrl
 import httpx
 
@@ -241,7 +241,7 @@ class ScammerProfiler:
         profile.risk_score = self._calculate_risk_score(profile)
         profile.confidence = min(0.5 + (profile.total_sessions * 0.1), 1.0)
         
-        logger.info(f"Updated profile {profile.profile_id}: {profile.total_sessions} sessions, risk={profile.risk_score}")
+        logger.info("Updated profile %s: %s sessions, risk=%s", profile.profile_id, profile.total_sessions, profile.risk_score)
         return profile.profile_id
     
     def _calculate_risk_score(self, profile: ScammerProfile) -> float:
@@ -274,17 +274,36 @@ class ScammerProfiler:
 # WEBHOOK MANAGER
 # =============================================================================
 
+# Deliveries waiting per URL before new events for it are dropped
+WEBHOOK_QUEUE_SIZE = 1000
+
+# Deliveries in flight per URL
+WEBHOOK_CONCURRENCY_PER_URL = 4
+
+# Per-attempt timeout; a slow subscriber only delays its own queue
+WEBHOOK_TIMEOUT = httpx.Timeout(3.0)
+
+
 class WebhookManager:
     """
     Manages webhook registrations and async event delivery
+    
+    Each URL gets its own bounded queue drained by a few worker tasks, so a
+    slow or dead subscriber backs up (and then drops) only its own events.
     """
     
     def __init__(self):
         self.webhooks: Dict[str, WebhookConfig] = {}
-        self.event_queue: asyncio.Queue = asyncio.Queue()
-        self._running = False
+        # url -> (queue of (webhook, event), its worker tasks)
+        self._queues: Dict[str, Tuple[asyncio.Queue, List[asyncio.Task]]] = {}
+        self.dropped = 0
+        self.http_client: Optional[httpx.AsyncClient] = None
         logger.info("WebhookManager initialized")
     
+    def bind_http(self, client: httpx.AsyncClient):
+        """Deliver through a shared client (one keep-alive pool for all webhooks)"""
+        self.http_client = client
+    
     def _generate_webhook_id(self) -> str:
         import uuid
         return f"wh-{uuid.uuid4().hex[:8]}"
@@ -304,10 +323,16 @@ class WebhookManager:
     
     def unregister(self, webhook_id: str) -> bool:
         """Unregister a webhook"""
-        if webhook_id in self.webhooks:
-            del self.webhooks[webhook_id]
-            return True
-        return False
+        webhook = self.webhooks.pop(webhook_id, None)
+        if webhook is None:
+            return False
+        # Tear down the URL's queue and workers once nothing delivers to it
+        if not any(w.url == webhook.url for w in self.webhooks.values()):
+            slot = self._queues.pop(webhook.url, None)
+            if slot is not None:
+                for worker in slot[1]:
+                    worker.cancel()
+        return True
     
     def list_webhooks(self) -> List[WebhookConfig]:
         """List all registered webhooks"""
@@ -324,39 +349,76 @@ class WebhookManager:
         # Find matching webhooks
         for webhook in self.webhooks.values():
             if webhook.active and event_type in webhook.events:
-                asyncio.create_task(self._send_webhook(webhook, event))
+                try:
+                    self._queue_for(webhook.url).put_nowait((webhook, event))
+                except asyncio.QueueFull:
+                    self.dropped += 1
+                    logger.warning(f"Webhook {webhook.webhook_id} queue full - dropped {event_type}")
+    
+    def _queue_for(self, url: str) -> asyncio.Queue:
+        """The delivery queue for `url`, starting its workers on first use"""
+        slot = self._queues.get(url)
+        if slot is None:
+            queue = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+            workers = [
+                asyncio.create_task(self._delivery_worker(queue))
+                for _ in range(WEBHOOK_CONCURRENCY_PER_URL)
+            ]
+            slot = self._queues[url] = (queue, workers)
+        return slot[0]
+    
+    async def _delivery_worker(self, queue: asyncio.Queue):
+        while True:
+            webhook, event = await queue.get()
+            try:
+                # Events queued before the webhook was unregistered are skipped
+                if self.webhooks.get(webhook.webhook_id) is webhook:
+                    await self._send_webhook(webhook, event)
+            except Exception as e:
+                logger.error(f"Webhook {webhook.webhook_id} delivery error: {e}")
+            finally:
+                queue.task_done()
+    
+    async def close(self):
+        """Stop the delivery workers (queued events are discarded)"""
+        for _, workers in self._queues.values():
+            for worker in workers:
+                worker.cancel()
+        self._queues.clear()
     
     async def _send_webhook(self, webhook: WebhookConfig, event: WebhookEvent):
         """Send webhook with retry"""
         max_retries = 3
         
+        # The body is sent as the exact bytes that were signed
+        payload = event.model_dump_json()
+        headers = {"Content-Type": "application/json"}
+        if webhook.secret:
+            # Add HMAC signature
+            import hmac
+            import hashlib
+            signature = hmac.new(
+                webhook.secret.encode(),
+                payload.encode(),
+                hashlib.sha256
+            ).hexdigest()
+            headers["X-Webhook-Signature"] = signature
+        
         for attempt in range(max_retries):
             try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    headers = {"Content-Type": "application/json"}
-                    if webhook.secret:
-                        # Add HMAC signature
-                        import hmac
-                        import hashlib
-                        payload = event.model_dump_json()
-                        signature = hmac.new(
-                            webhook.secret.encode(),
-                            payload.encode(),
-                            hashlib.sha256
-                        ).hexdigest()
-                        headers["X-Webhook-Signature"] = signature
-                    
-                    response = await client.post(
-                        webhook.url,
-                        json=event.model_dump(),
-                        headers=headers
+                if self.http_client is not None:
+                    response = await self.http_client.post(
+                        webhook.url, content=payload, headers=headers, timeout=WEBHOOK_TIMEOUT
                     )
-                    
-                    if response.status_code in [200, 201, 202, 204]:
-                        logger.info(f"Webhook {webhook.webhook_id} delivered: {event.event_type}")
-                        return
-                    else:
-                        logger.warning(f"Webhook {webhook.webhook_id} failed: {response.status_code}")
+                else:
+                    async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT) as client:
+                        response = await client.post(webhook.url, content=payload, headers=headers)
+                
+                if response.status_code in [200, 201, 202, 204]:
+                    logger.info("Webhook %s delivered: %s", webhook.webhook_id, event.event_type)
+                    return
+                else:
+                    logger.warning(f"Webhook {webhook.webhook_id} failed: {response.status_code}")
             except Exception as e:
                 logger.error(f"Webhook {webhook.webhook_id} error (attempt {attempt+1}): {e}")
                 await asyncio.sleep(2 ** attempt)  # Exponential backoff
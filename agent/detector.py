@@ -4,15 +4,68 @@ Enhanced with Scam-Triad heuristic for early detection
 """
 
 import re
-from typing import Dict, List, Tuple
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import accumulate
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
 import logging
 import os
-import json
+import time
 
 from agent.models import DetectionResult, ScamTriadScore
+from agent.regex_engine import compile_pattern
+from agent._anthropic import get_async_anthropic_client
+from agent._gemini import get_genai_client, get_legacy_model
+from agent.llm_utils import history_messages, parse_json_response, run_message_batch
+from agent.llm_combined import get_combined_analyzer
 
 logger = logging.getLogger(__name__)
 
+# Optional: Aho-Corasick automaton for scam-type keyword matching
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Fixed LLM classification instructions. The message goes last, in its own
+# user turn, so Anthropic can cache this prefix across calls.
+_DETECT_SYSTEM = """Analyze if the user's latest message is a scam attempt (earlier turns are context).
+
+Look for:
+1. Impersonation (bank, govt, company, courier)
+2. Urgency/threats
+3. Financial requests
+4. Suspicious links/contacts
+
+Respond with JSON only:
+{"is_scam": true/false, "confidence": 0.0-1.0, "scam_type": "type or unknown"}"""
+
+# Single-prompt form for Gemini, built once; only message/context are filled per call
+_DETECT_PROMPT = (
+    _DETECT_SYSTEM.replace('{', '{{').replace('}', '}}')
+    + '\n\nMessage: "{message}"\n\nContext:\n{context}'
+)
+
+# Campaigns blast the same message to many victims: a repeat (with the same
+# recent turns) within the TTL reuses the earlier DetectionResult, LLM included
+DETECTION_CACHE_SIZE = 4096
+DETECTION_CACHE_TTL = 300
+
+# Caps for (urgency, authority, emotion, financial)
+_TRIAD_CAPS = (3.0, 3.0, 2.0, 2.0)
+
+
+def _compile_weighted(patterns: tuple) -> tuple:
+    """Compile (pattern, weight) pairs, heaviest first so category caps are hit early"""
+    return tuple(sorted(
+        ((compile_pattern(p, re.IGNORECASE), w) for p, w in patterns),
+        key=lambda pair: pair[1],
+        reverse=True
+    ))
+
 
 class ScamDetector:
     """
@@ -25,7 +78,7 @@ class ScamDetector:
     # ==========================================================================
     
     # URGENCY patterns (score: 0-3)
-    URGENCY_PATTERNS = [
+    URGENCY_PATTERNS = (
         (r'\b(immediate(ly)?|urgent|urgently|asap|right now|now\b)', 1.0),
         (r'within \d+ (hour|minute|day)s?', 1.5),
         (r'(will be|would be|shall be|being) (blocked|suspended|closed|terminated|deleted|frozen)', 2.0),
@@ -37,10 +90,10 @@ class ScamDetector:
         (r'\d+ (hour|minute)s? (left|remaining)', 1.0),
         (r'pending.*(update|verification|action)', 1.5),
         (r'update.*pending', 1.5),
-    ]
+    )
     
     # AUTHORITY patterns (score: 0-3)
-    AUTHORITY_PATTERNS = [
+    AUTHORITY_PATTERNS = (
         # Banks (high priority)
         (r'\b(sbi|state bank of india|hdfc|icici|axis|kotak|pnb|bank of|canara|bob)\b', 2.0),
         (r'\b(rbi|reserve bank|central bank)\b', 2.5),
@@ -73,10 +126,10 @@ class ScamDetector:
         (r'this is (from|official|calling from)', 1.0),
         (r'(authorized|verified|genuine|legitimate) (agent|representative|executive)', 1.5),
         (r'from\s+(the\s+)?bank\b', 1.5),
-    ]
+    )
     
     # EMOTIONAL MANIPULATION patterns (score: 0-2)
-    EMOTION_PATTERNS = [
+    EMOTION_PATTERNS = (
         (r'congratulations?!?', 1.5),
         (r'\b(won|winner|lucky|selected|chosen)\b', 1.5),
         (r'\b(lottery|lott?ery|prize|jackpot|lucky draw)\b', 2.0),
@@ -86,10 +139,16 @@ class ScamDetector:
         (r'(lose|lost) (your|all|everything)', 1.0),
         (r'(warning|alert|notice|attention)', 0.5),
         (r'(don\'t|do not) (ignore|miss|delay)', 0.5),
-    ]
+    )
+    
+    # Compiled once at import. Weights are per pattern, so each category keeps
+    # its own list instead of collapsing into a single alternation.
+    _URGENCY_RE = _compile_weighted(URGENCY_PATTERNS)
+    _AUTHORITY_RE = _compile_weighted(AUTHORITY_PATTERNS)
+    _EMOTION_RE = _compile_weighted(EMOTION_PATTERNS)
     
     # FINANCIAL REQUEST patterns (score: 0-2)  
-    FINANCIAL_PATTERNS = [
+    FINANCIAL_PATTERNS = (
         (r'(pay|send|transfer|deposit)\s*(rs\.?|₹|inr|rupees?)?\s*\d+', 1.5),
         (r'\b(upi|gpay|phonepe|paytm|bhim)\b', 1.0),
         (r'@(paytm|okaxis|oksbi|okicici|ybl|upi|apl|ibl)', 1.5),  # UPI handles
@@ -104,13 +163,14 @@ class ScamDetector:
         (r'(get|earn|receive)\s*(rs\.?|₹|inr)?\s*\d+', 1.0),
         (r'\b(lakhs?|crores?)\b.*(profit|return)', 1.5),
         (r'(profit|return).*(lakhs?|crores?)\b', 1.5),
-    ]
+    )
+    _FINANCIAL_RE = _compile_weighted(FINANCIAL_PATTERNS)
     
     # ==========================================================================
     # PROMPT INJECTION DETECTION
     # ==========================================================================
     
-    INJECTION_PATTERNS = [
+    INJECTION_PATTERNS = (
         r'ignore (all )?(previous|above|prior) (instructions|prompts|commands)',
         r'system (override|prompt|command)',
         r'you are (now|actually) (a|an)',
@@ -120,32 +180,40 @@ class ScamDetector:
         r'pretend (to be|you are)',
         r'act as (if|though)',
         r'bypass (the|your|all)',
-    ]
+    )
+    
+    # Only a yes/no answer is needed, so all patterns share one scan
+    _INJECTION_RE = compile_pattern('|'.join(f'(?:{p})' for p in INJECTION_PATTERNS), re.IGNORECASE)
     
     # ==========================================================================
     # SCAM TYPE KEYWORDS
     # ==========================================================================
     
-    SCAM_TYPE_KEYWORDS = {
-        'bank_impersonation': ['kyc', 'account blocked', 'verify account', 'bank', 'sbi', 'hdfc', 'icici', 'rbi'],
-        'lottery': ['lottery', 'prize', 'winner', 'jackpot', 'lucky draw', 'won', 'congratulations'],
-        'courier': ['fedex', 'dhl', 'courier', 'parcel', 'package', 'customs', 'clearance'],
-        'tax_refund': ['tax refund', 'income tax', 'gst refund', 'it department', 'tax department'],
-        'investment': ['investment', 'guaranteed returns', 'profit', 'trading', 'crypto', 'bitcoin', 'sebi'],
-        'job_offer': ['job offer', 'selected', 'recruitment', 'hr department', 'offer letter', 'salary'],
-        'tech_support': ['instagram', 'facebook', 'account hacked', 'security alert', 'verify account'],
-        'utility': ['electricity', 'power cut', 'bill pending', 'disconnection', 'meter reading'],
-    }
+    SCAM_TYPE_KEYWORDS = MappingProxyType({
+        'bank_impersonation': ('kyc', 'account blocked', 'verify account', 'bank', 'sbi', 'hdfc', 'icici', 'rbi'),
+        'lottery': ('lottery', 'prize', 'winner', 'jackpot', 'lucky draw', 'won', 'congratulations'),
+        'courier': ('fedex', 'dhl', 'courier', 'parcel', 'package', 'customs', 'clearance'),
+        'tax_refund': ('tax refund', 'income tax', 'gst refund', 'it department', 'tax department'),
+        'investment': ('investment', 'guaranteed returns', 'profit', 'trading', 'crypto', 'bitcoin', 'sebi'),
+        'job_offer': ('job offer', 'selected', 'recruitment', 'hr department', 'offer letter', 'salary'),
+        'tech_support': ('instagram', 'facebook', 'account hacked', 'security alert', 'verify account'),
+        'utility': ('electricity', 'power cut', 'bill pending', 'disconnection', 'meter reading'),
+    })
+    
+    # Built lazily from SCAM_TYPE_KEYWORDS (see _find_keywords)
+    _keyword_automaton = None
     
     def __init__(self):
         """Initialize detector with LLM clients"""
+        # (message, last 3 (role, message) turns) -> (expires_at, result), least recently used first
+        self._detection_cache: "OrderedDict[Tuple, Tuple[float, DetectionResult]]" = OrderedDict()
+        
         # Try to initialize Gemini (primary)
         self.gemini_model = None
         google_key = os.getenv('GOOGLE_API_KEY')
         if google_key:
             try:
-                from google import genai
-                self.genai_client = genai.Client(api_key=google_key)
+                self.genai_client = get_genai_client(google_key)
                 self.gemini_model = "gemini-2.0-flash"
                 logger.info("✓ Gemini initialized for detection")
             except ImportError:
@@ -162,61 +230,24 @@ class ScamDetector:
                 logger.warning(f"Gemini init failed: {e}")
         
         # Try to initialize Anthropic (fallback)
-        self.anthropic_client = None
-        anthropic_key = os.getenv('ANTHROPIC_API_KEY')
-        if anthropic_key:
-            try:
-                from anthropic import Anthropic
-                self.anthropic_client = Anthropic(api_key=anthropic_key)
-                logger.info("✓ Anthropic initialized for detection fallback")
-            except Exception as e:
-                logger.warning(f"Anthropic init failed: {e}")
+        self.anthropic_client = get_async_anthropic_client()
+        if self.anthropic_client:
+            logger.info("✓ Anthropic initialized for detection fallback")
         
         if not self.gemini_model and not self.anthropic_client:
             logger.warning("No LLM available - using rule-based detection only")
     
     def _check_injection(self, message: str) -> bool:
         """Detect prompt injection attempts"""
-        message_lower = message.lower()
-        for pattern in self.INJECTION_PATTERNS:
-            if re.search(pattern, message_lower, re.IGNORECASE):
-                logger.warning(f"Prompt injection detected: {pattern}")
-                return True
+        match = self._INJECTION_RE.search(message)
+        if match:
+            logger.warning(f"Prompt injection detected: {match.group(0)}")
+            return True
         return False
     
     def _calculate_triad_score(self, message: str) -> ScamTriadScore:
         """Calculate Scam-Triad scores"""
-        message_lower = message.lower()
-        
-        urgency = 0.0
-        authority = 0.0
-        emotion = 0.0
-        financial = 0.0
-        
-        # Calculate urgency score
-        for pattern, weight in self.URGENCY_PATTERNS:
-            if re.search(pattern, message_lower, re.IGNORECASE):
-                urgency += weight
-        urgency = min(urgency, 3.0)
-        
-        # Calculate authority score
-        for pattern, weight in self.AUTHORITY_PATTERNS:
-            if re.search(pattern, message_lower, re.IGNORECASE):
-                authority += weight
-        authority = min(authority, 3.0)
-        
-        # Calculate emotion score
-        for pattern, weight in self.EMOTION_PATTERNS:
-            if re.search(pattern, message_lower, re.IGNORECASE):
-                emotion += weight
-        emotion = min(emotion, 2.0)
-        
-        # Calculate financial score
-        for pattern, weight in self.FINANCIAL_PATTERNS:
-            if re.search(pattern, message_lower, re.IGNORECASE):
-                financial += weight
-        financial = min(financial, 2.0)
-        
+        urgency, authority, emotion, financial = self._triad_components(message)
         return ScamTriadScore(
             urgency=urgency,
             authority=authority,
@@ -224,13 +255,84 @@ class ScamDetector:
             financial=financial
         )
     
-    def _detect_scam_type(self, message: str) -> str:
+    # Scam campaigns blast the same text to many victims, so the rule-based
+    # scores are memoized per message (pure functions of the class patterns)
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def _triad_components(cls, message: str) -> Tuple[float, float, float, float]:
+        """(urgency, authority, emotion, financial) scores for a message"""
+        urgency = cls._category_score(cls._URGENCY_RE, message, 3.0)
+        authority = cls._category_score(cls._AUTHORITY_RE, message, 3.0)
+        emotion = cls._category_score(cls._EMOTION_RE, message, 2.0)
+        financial = cls._category_score(cls._FINANCIAL_RE, message, 2.0)
+        
+        return urgency, authority, emotion, financial
+    
+    @staticmethod
+    def _category_score(patterns: tuple, message: str, cap: float) -> float:
+        """Sum of matching pattern weights, capped; stops searching once the cap is reached"""
+        score = 0.0
+        for pattern, weight in patterns:
+            if pattern.search(message):
+                score += weight
+                if score >= cap:
+                    return cap
+        return score
+    
+    @classmethod
+    def _get_keyword_automaton(cls):
+        if cls._keyword_automaton is None:
+            automaton = ahocorasick.Automaton()
+            for keywords in cls.SCAM_TYPE_KEYWORDS.values():
+                for kw in keywords:
+                    automaton.add_word(kw, kw)
+            automaton.make_automaton()
+            cls._keyword_automaton = automaton
+        return cls._keyword_automaton
+    
+    @classmethod
+    def _find_keywords(cls, message_lower: str) -> set:
+        """Return every SCAM_TYPE_KEYWORDS entry present in the message, in one pass"""
+        return {kw for _, kw in cls._get_keyword_automaton().iter(message_lower)}
+    
+    @classmethod
+    def _find_keywords_many(cls, messages: List[str]) -> List[set]:
+        """_find_keywords for many messages with one scan over a joined buffer"""
+        lowered = [message.lower() for message in messages]
+        # No keyword contains '\x00', so none can match across a boundary
+        joined = '\x00'.join(lowered)
+        starts = [0, *accumulate(len(m) + 1 for m in lowered[:-1])]
+        found = [set() for _ in messages]
+        
+        if AHOCORASICK_AVAILABLE:
+            for end, kw in cls._get_keyword_automaton().iter(joined):
+                found[bisect_right(starts, end) - 1].add(kw)
+        else:
+            for keywords in cls.SCAM_TYPE_KEYWORDS.values():
+                for kw in keywords:
+                    pos = joined.find(kw)
+                    while pos != -1:
+                        found[bisect_right(starts, pos) - 1].add(kw)
+                        pos = joined.find(kw, pos + 1)
+        return found
+    
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def _detect_scam_type(cls, message: str) -> str:
         """Detect the type of scam"""
         message_lower = message.lower()
-        scores = {}
         
-        for scam_type, keywords in self.SCAM_TYPE_KEYWORDS.items():
-            score = sum(1 for kw in keywords if kw in message_lower)
+        # `kw in haystack` works on both: a set of found keywords when the
+        # automaton is available, otherwise a substring check on the message
+        haystack = cls._find_keywords(message_lower) if AHOCORASICK_AVAILABLE else message_lower
+        return cls._scam_type_from_keywords(haystack)
+    
+    @classmethod
+    def _scam_type_from_keywords(cls, haystack) -> str:
+        """Scam type with the most keywords `in` haystack (found keywords or the message)"""
+        scores = {}
+        for scam_type, keywords in cls.SCAM_TYPE_KEYWORDS.items():
+            score = sum(1 for kw in keywords if kw in haystack)
             if score > 0:
                 scores[scam_type] = score
         
@@ -238,28 +340,115 @@ class ScamDetector:
             return max(scores, key=scores.get)
         return "unknown"
     
-    def _determine_threat_level(self, triad: ScamTriadScore) -> str:
-        """Determine threat level from triad score"""
-        total = triad.total
-        if total >= 7:
-            return "high"
-        elif total >= 4:
-            return "med"
-        else:
-            return "low"
+    # Lowest triad total of 'med' and 'high'
+    _THREAT_THRESHOLDS = (4, 7)
+    _THREAT_LEVELS = ('low', 'med', 'high')
+    
+    def threat_level(self, triad: ScamTriadScore) -> str:
+        """Threat level (low / med / high) for a triad score"""
+        return self._THREAT_LEVELS[bisect_right(self._THREAT_THRESHOLDS, triad.total)]
     
     async def detect(
         self, 
         message: str, 
-        conversation_history: List[Dict] = None
+        conversation_history: List[Dict] = None,
+        session: Optional[Dict] = None
     ) -> DetectionResult:
         """
         Main detection method - Scam-Triad + LLM hybrid
         
+        With a session, edge cases use the combined detection+extraction
+        call so the extractor can reuse it for the same message.
         Returns DetectionResult with is_scam, confidence, and forensics
         """
         conversation_history = conversation_history or []
+        cache_key = (message, tuple((turn.get('role'), turn.get('message')) for turn in conversation_history[-3:]))
+        cached = self._detection_cache.get(cache_key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._detection_cache.move_to_end(cache_key)
+            # Shallow copy: callers may set fields but must not mutate
+            # detected_patterns / triad_score in place (shared with the cache)
+            return cached[1].model_copy()
         
+        result = self._rule_based_detection(message, conversation_history)
+        
+        # LLM enhancement for edge cases (score between 3-5)
+        if self._needs_llm(result):
+            logger.info("Edge case - using LLM for classification...")
+            llm_result = await self._session_llm_detection(message, conversation_history, session)
+            if llm_result:
+                self._apply_llm_result(result, llm_result)
+        
+        # Injection attempts are not cached, so each one is logged again
+        if not result.injection_detected:
+            self._detection_cache[cache_key] = (time.monotonic() + DETECTION_CACHE_TTL, result.model_copy())
+            self._detection_cache.move_to_end(cache_key)
+            if len(self._detection_cache) > DETECTION_CACHE_SIZE:
+                self._detection_cache.popitem(last=False)
+        return result
+    
+    async def detect_batch(self, messages: List[str]) -> List[DetectionResult]:
+        """
+        Detect many standalone messages (evaluation / replay)
+        
+        Edge cases go to the LLM together through the Message Batches API,
+        so this is for bulk work, not live turns.
+        """
+        results = self.detect_many(messages)
+        
+        edge_cases = [i for i, result in enumerate(results) if self._needs_llm(result)]
+        if edge_cases:
+            logger.info("%s edge cases - using LLM for classification...", len(edge_cases))
+            llm_results = await self._llm_detection_batch([messages[i] for i in edge_cases])
+            for i, llm_result in zip(edge_cases, llm_results):
+                if llm_result:
+                    self._apply_llm_result(results[i], llm_result)
+        
+        return results
+    
+    def quick_detect(self, message: str) -> DetectionResult:
+        """Rule-based detection of a standalone message (no LLM call)"""
+        return self._rule_based_detection(message, [])
+    
+    def detect_many(self, messages: List[str]) -> List[DetectionResult]:
+        """
+        Rule-based detection for many standalone messages (corpus replay)
+        
+        Scam-type keywords are found in one scan over all messages joined
+        together instead of a keyword loop per message.
+        """
+        scam_types = [
+            self._scam_type_from_keywords(found)
+            for found in self._find_keywords_many(messages)
+        ]
+        return [
+            self._rule_based_detection(message, [], scam_type)
+            for message, scam_type in zip(messages, scam_types)
+        ]
+    
+    def _needs_llm(self, result: DetectionResult) -> bool:
+        """Rule-based score is ambiguous (3-5) and an LLM is configured"""
+        return (
+            not result.injection_detected
+            and 3.0 < result.triad_score.total < 5.0
+            and bool(self.gemini_model or self.anthropic_client)
+        )
+    
+    def _apply_llm_result(self, result: DetectionResult, llm_result: Dict):
+        """Combine rule-based and LLM results (60/40)"""
+        combined_confidence = result.confidence_score * 0.6 + llm_result.get('confidence', 0.5) * 0.4
+        result.is_scam = combined_confidence > 0.5
+        result.confidence_score = combined_confidence
+        if llm_result.get('scam_type'):
+            result.scam_type = llm_result['scam_type']
+    
+    def _rule_based_detection(
+        self,
+        message: str,
+        conversation_history: List[Dict],
+        scam_type: Optional[str] = None
+    ) -> DetectionResult:
+        """Injection check + Scam-Triad scoring, no LLM (scam_type if already known)"""
         # Step 1: Check for prompt injection
         injection_detected = self._check_injection(message)
         if injection_detected:
@@ -275,28 +464,33 @@ class ScamDetector:
             )
         
         # Step 2: Calculate Scam-Triad score
-        triad_score = self._calculate_triad_score(message)
-        scam_type = self._detect_scam_type(message)
+        # Scored as plain (urgency, authority, emotion, financial) floats;
+        # only the final combined score becomes a ScamTriadScore
+        triad_score = self._triad_components(message)
+        if scam_type is None:
+            scam_type = self._detect_scam_type(message)
         
         # Also check conversation context for cumulative detection
-        context_score = ScamTriadScore()
+        context_score = (0.0, 0.0, 0.0, 0.0)
         if conversation_history:
             for turn in conversation_history[-3:]:  # Last 3 messages
                 if turn.get('role') == 'scammer':
-                    ctx_triad = self._calculate_triad_score(turn.get('message', ''))
-                    context_score = ScamTriadScore(
-                        urgency=min(context_score.urgency + ctx_triad.urgency * 0.5, 3.0),
-                        authority=min(context_score.authority + ctx_triad.authority * 0.5, 3.0),
-                        emotion=min(context_score.emotion + ctx_triad.emotion * 0.5, 2.0),
-                        financial=min(context_score.financial + ctx_triad.financial * 0.5, 2.0)
+                    ctx_triad = self._triad_components(turn.get('message', ''))
+                    context_score = tuple(
+                        min(ctx + turn_score * 0.5, cap)
+                        for ctx, turn_score, cap in zip(context_score, ctx_triad, _TRIAD_CAPS)
                     )
         
         # Combine current + context (70% current, 30% context)
+        urgency, authority, emotion, financial = (
+            min(current * 0.7 + ctx * 0.3, cap)
+            for current, ctx, cap in zip(triad_score, context_score, _TRIAD_CAPS)
+        )
         combined_triad = ScamTriadScore(
-            urgency=min(triad_score.urgency * 0.7 + context_score.urgency * 0.3, 3.0),
-            authority=min(triad_score.authority * 0.7 + context_score.authority * 0.3, 3.0),
-            emotion=min(triad_score.emotion * 0.7 + context_score.emotion * 0.3, 2.0),
-            financial=min(triad_score.financial * 0.7 + context_score.financial * 0.3, 2.0)
+            urgency=urgency,
+            authority=authority,
+            emotion=emotion,
+            financial=financial
         )
         
         total_score = combined_triad.total
@@ -315,18 +509,6 @@ class ScamDetector:
             f"Total={total_score:.1f} -> is_scam={is_scam}"
         )
         
-        # Step 4: LLM enhancement for edge cases (score between 3-5)
-        if 3.0 < total_score < 5.0 and (self.gemini_model or self.anthropic_client):
-            logger.info("Edge case - using LLM for classification...")
-            llm_result = await self._llm_detection(message, conversation_history)
-            if llm_result:
-                # Combine rule-based and LLM results
-                combined_confidence = confidence * 0.6 + llm_result.get('confidence', 0.5) * 0.4
-                is_scam = combined_confidence > 0.5
-                confidence = combined_confidence
-                if llm_result.get('scam_type'):
-                    scam_type = llm_result['scam_type']
-        
         return DetectionResult(
             is_scam=is_scam,
             confidence_score=confidence,
@@ -337,77 +519,87 @@ class ScamDetector:
             injection_detected=False
         )
     
+    def _anthropic_params(self, message: str, conversation_history: List[Dict]) -> Dict:
+        """messages.create params for a classification request"""
+        # Prior turns go as real messages so their prefix is cached across calls
+        return {
+            "model": "claude-3-5-haiku-20241022",
+            "max_tokens": 100,
+            "temperature": 0.1,
+            "system": [{"type": "text", "text": _DETECT_SYSTEM, "cache_control": {"type": "ephemeral"}}],
+            "messages": history_messages(conversation_history[-3:], f'Message: "{message}"'),
+        }
+    
+    async def _llm_detection_batch(self, messages: List[str]) -> List[Optional[Dict]]:
+        """Classify standalone messages, as one Anthropic batch when possible"""
+        if not self.anthropic_client:
+            return [await self._llm_detection(message, []) for message in messages]
+        
+        texts = await run_message_batch(
+            self.anthropic_client,
+            [self._anthropic_params(message, []) for message in messages]
+        )
+        results = []
+        for text in texts:
+            try:
+                results.append(parse_json_response(text) if text else None)
+            except Exception as e:
+                logger.error(f"Anthropic batch detection failed: {e}")
+                results.append(None)
+        return results
+    
+    async def _session_llm_detection(
+        self,
+        message: str,
+        conversation_history: List[Dict],
+        session: Optional[Dict]
+    ) -> Optional[Dict]:
+        """Classification through the combined call when there is a session to share it with"""
+        if session is not None:
+            analyzer = get_combined_analyzer()
+            if analyzer.available:
+                analysis = await analyzer.analyze_for_session(message, session)
+                return analysis['detection'] if analysis else None
+        return await self._llm_detection(message, conversation_history)
+    
     async def _llm_detection(
         self, 
         message: str, 
         conversation_history: List[Dict]
     ) -> Dict:
         """LLM-based classification with fallback chain"""
-        
-        # Build context
         context = "\n".join([
             f"{msg['role']}: {msg['message']}"
             for msg in conversation_history[-3:]
         ]) if conversation_history else "No prior context"
-        
-        prompt = f"""Analyze if this message is a scam attempt.
-
-Message: "{message}"
-
-Context:
-{context}
-
-Look for:
-1. Impersonation (bank, govt, company, courier)
-2. Urgency/threats
-3. Financial requests
-4. Suspicious links/contacts
-
-Respond with JSON only:
-{{"is_scam": true/false, "confidence": 0.0-1.0, "scam_type": "type or unknown"}}"""
+        prompt = _DETECT_PROMPT.format(message=message, context=context)
 
         # Try Gemini first
         if self.gemini_model:
             try:
                 if self.genai_client:
                     # New SDK
-                    response = self.genai_client.models.generate_content(
+                    response = await self.genai_client.aio.models.generate_content(
                         model=self.gemini_model,
                         contents=prompt
                     )
                     result_text = response.text.strip()
                 else:
                     # Legacy SDK
-                    import google.generativeai as genai
-                    model = genai.GenerativeModel(self.gemini_model)
-                    response = model.generate_content(prompt)
+                    response = await get_legacy_model(self.gemini_model).generate_content_async(prompt)
                     result_text = response.text.strip()
                 
-                # Parse JSON
-                if '```' in result_text:
-                    result_text = result_text.split('```')[1]
-                    if result_text.startswith('json'):
-                        result_text = result_text[4:]
-                
-                return json.loads(result_text)
+                return parse_json_response(result_text)
             except Exception as e:
                 logger.error(f"Gemini detection failed: {e}")
         
         # Try Anthropic as fallback
         if self.anthropic_client:
             try:
-                response = self.anthropic_client.messages.create(
-                    model="claude-3-5-haiku-20241022",
-                    max_tokens=100,
-                    temperature=0.1,
-                    messages=[{"role": "user", "content": prompt}]
-                )
+                response = await self.anthropic_client.messages.create(**self._anthropic_params(message, conversation_history))
+                logger.debug("Anthropic detection cache read: %s tokens", response.usage.cache_read_input_tokens or 0)
                 result_text = response.content[0].text.strip()
-                if '```' in result_text:
-                    result_text = result_text.split('```')[1]
-                    if result_text.startswith('json'):
-                        result_text = result_text[4:]
-                return json.loads(result_text)
+                return parse_json_response(result_text)
             except Exception as e:
                 logger.error(f"Anthropic detection failed: {e}")
         
@@ -430,9 +622,9 @@ if __name__ == "__main__":
     ]
     
     async def test():
-        for msg in test_messages:
+        results = await detector.detect_batch(test_messages)
+        for msg, result in zip(test_messages, results):
             print(f"\nMessage: {msg}")
-            result = await detector.detect(msg, [])
             print(f"is_scam: {result.is_scam}, confidence: {result.confidence_score:.2f}")
             print(f"triad: U={result.triad_score.urgency:.1f} A={result.triad_score.authority:.1f}")
             print(f"type: {result.scam_type}, injection: {result.injection_detected}")
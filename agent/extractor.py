@@ -5,16 +5,98 @@ Handles obfuscated UPIs, hidden bank details, etc.
 Enhanced with UPI bank validation and intel scoring
 """
 
+import asyncio
 import re
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
 import logging
 import os
 import json
 
-from agent.models import ExtractedEntities, BankAccount, ValidatedUPI, validate_upi
+from agent.models import ExtractedEntities, validate_upi
+from agent.regex_engine import compile_pattern
+from agent._anthropic import get_async_anthropic_client
+from agent._gemini import get_genai_client, get_legacy_model
+from agent.llm_utils import parse_json_response, run_message_batch
+from agent.llm_combined import CombinedLLMAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# Optional: Hyperscan for single-pass pattern prefiltering
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+# Any character \d can match (stdlib re, a superset of re2's ASCII \d)
+_DIGIT_RE = re.compile(r'\d')
+
+# Fixed LLM extraction instructions. The message goes last, in its own user
+# turn, so Anthropic can cache this prefix across calls.
+_EXTRACT_SYSTEM = """Extract financial and contact information from the user's message.
+Look for obfuscated data like "p-a-y-t-m" = paytm, spaced phone numbers, etc.
+
+Return JSON only (no markdown):
+{"upi_ids": [], "bank_accounts": [{"account_number": "", "ifsc": "", "bank_name": ""}], "phone_numbers": [], "urls": [], "emails": []}
+
+If nothing found, return empty arrays."""
+
+# Single-prompt form for Gemini, built once; only the message is filled per call
+_EXTRACT_PROMPT = (
+    _EXTRACT_SYSTEM.replace('{', '{{').replace('}', '}}')
+    + '\n\nMessage: "{message}"'
+)
+
+
+def _compile_patterns(patterns: Mapping[str, str], caseless: tuple = ()) -> Mapping:
+    """Compile a name -> pattern table once, case-insensitive for names in `caseless`"""
+    return MappingProxyType({
+        name: compile_pattern(pattern, re.IGNORECASE if name in caseless else 0)
+        for name, pattern in patterns.items()
+    })
+
+
+class _HyperscanPrefilter:
+    """
+    Finds which compiled patterns occur in a message with one Hyperscan pass.
+    
+    re still produces the actual matches, so findall semantics are unchanged;
+    the scan only tells the extractor which patterns it can skip. Hyperscan's
+    \d, \w, \s and \b are ASCII-only, so non-ASCII text (and the ASCII
+    separator controls Python treats as whitespace) is not prefiltered.
+    """
+    
+    _PYTHON_ONLY_WHITESPACE = frozenset('\x1c\x1d\x1e\x1f')
+    
+    def __init__(self, patterns: Mapping):
+        self._names = list(patterns)
+        self._db = hyperscan.Database()
+        self._db.compile(
+            expressions=[p.pattern.encode('utf-8') for p in patterns.values()],
+            ids=list(range(len(self._names))),
+            elements=len(self._names),
+            flags=[
+                hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8
+                # re2 patterns carry IGNORECASE inline as (?i), which Hyperscan accepts
+                | (hyperscan.HS_FLAG_CASELESS if getattr(p, 'flags', 0) & re.IGNORECASE else 0)
+                for p in patterns.values()
+            ],
+        )
+    
+    def scan(self, text: str) -> Optional[set]:
+        """Names of patterns present in text, or None if the text can't be prefiltered"""
+        if not text.isascii() or not self._PYTHON_ONLY_WHITESPACE.isdisjoint(text):
+            return None
+        
+        hits = set()
+        
+        def on_match(pattern_id, start, end, flags, context):
+            hits.add(self._names[pattern_id])
+        
+        self._db.scan(text.encode('ascii'), match_event_handler=on_match)
+        return hits
+
 
 class IntelligenceExtractor:
     """
@@ -26,7 +108,7 @@ class IntelligenceExtractor:
     # REGEX PATTERNS
     # ==========================================================================
     
-    PATTERNS = {
+    PATTERNS = MappingProxyType({
         # UPI IDs - standard and obfuscated
         'upi_standard': r'\b[a-zA-Z0-9._-]+@[a-zA-Z]{2,}(?:axis|sbi|icici|hdfc|paytm|ybl|upi|apl|ibl|okaxis|oksbi|okicici)\b',
         'upi_general': r'\b[a-zA-Z0-9._-]+@[a-zA-Z]{3,}\b',
@@ -51,10 +133,32 @@ class IntelligenceExtractor:
         
         # Email
         'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b',
-    }
+    })
+    
+    # Feature a message must have before each pattern can match at all
+    _PATTERN_FEATURES = MappingProxyType({
+        'upi_standard': 'at',
+        'upi_general': 'at',
+        'email': 'at',
+        'phone': 'digit',
+        'phone_spaced': 'digit',
+        'phone_obfuscated': 'digit',
+        'bank_account': 'digit',
+        'ifsc': 'digit',
+        'amount_rupee': 'digit_or_comma',
+        'amount_lakh': 'digit',
+        'amount_crore': 'digit',
+        'url': 'scheme',
+        'short_url': 'slash',
+    })
+    
+    _PATTERNS_RE = _compile_patterns(
+        PATTERNS,
+        caseless=('upi_standard', 'upi_general', 'amount_rupee', 'amount_lakh', 'amount_crore'),
+    )
     
     # Bank name patterns
-    BANK_NAMES = {
+    BANK_NAMES = MappingProxyType({
         'SBI': r'\b(?:sbi|state\s*bank)\b',
         'HDFC': r'\bhdfc\b',
         'ICICI': r'\bicici\b',
@@ -66,17 +170,19 @@ class IntelligenceExtractor:
         'PAYTM': r'\bpaytm\b',
         'PHONEPE': r'\bphonepe\b',
         'GPAY': r'\b(?:gpay|google\s*pay)\b',
-    }
+    })
+    _BANK_NAMES_RE = tuple((name, compile_pattern(p, re.IGNORECASE)) for name, p in BANK_NAMES.items())
     
     # Obfuscation patterns (e.g., "p-a-y-t-m" or "p a y t m")
-    DEOBFUSCATION_MAP = {
+    DEOBFUSCATION_MAP = MappingProxyType({
         r'p[\s\-\.]*a[\s\-\.]*y[\s\-\.]*t[\s\-\.]*m': 'paytm',
         r'g[\s\-\.]*p[\s\-\.]*a[\s\-\.]*y': 'gpay',
         r'p[\s\-\.]*h[\s\-\.]*o[\s\-\.]*n[\s\-\.]*e[\s\-\.]*p[\s\-\.]*e': 'phonepe',
         r's[\s\-\.]*b[\s\-\.]*i': 'sbi',
         r'h[\s\-\.]*d[\s\-\.]*f[\s\-\.]*c': 'hdfc',
         r'i[\s\-\.]*c[\s\-\.]*i[\s\-\.]*c[\s\-\.]*i': 'icici',
-    }
+    })
+    _DEOBFUSCATION_RE = tuple((compile_pattern(p, re.IGNORECASE), r) for p, r in DEOBFUSCATION_MAP.items())
     
     def __init__(self):
         """Initialize extractor with LLM client"""
@@ -87,8 +193,7 @@ class IntelligenceExtractor:
         google_key = os.getenv('GOOGLE_API_KEY')
         if google_key:
             try:
-                from google import genai
-                self.genai_client = genai.Client(api_key=google_key)
+                self.genai_client = get_genai_client(google_key)
                 self.model = "gemini-2.0-flash"
                 self.llm_available = True
                 self._use_new_sdk = True
@@ -107,36 +212,65 @@ class IntelligenceExtractor:
                 logger.warning(f"Gemini init failed: {e}")
         
         # Try Anthropic as fallback
-        self.anthropic_client = None
-        anthropic_key = os.getenv('ANTHROPIC_API_KEY')
-        if anthropic_key:
-            try:
-                from anthropic import Anthropic
-                self.anthropic_client = Anthropic(api_key=anthropic_key)
-                logger.info("✓ Anthropic initialized for extraction fallback")
-            except Exception as e:
-                logger.warning(f"Anthropic init failed: {e}")
+        self.anthropic_client = get_async_anthropic_client()
+        if self.anthropic_client:
+            logger.info("✓ Anthropic initialized for extraction fallback")
         
         if not self.llm_available and not self.anthropic_client:
             logger.warning("No LLM available - using regex extraction only")
+        
+        # Single-pass prefilter over PATTERNS (optional)
+        self._prefilter = None
+        if HYPERSCAN_AVAILABLE:
+            try:
+                self._prefilter = _HyperscanPrefilter(self._PATTERNS_RE)
+                logger.info("✓ Hyperscan prefilter enabled for extraction")
+            except Exception as e:
+                logger.warning(f"Hyperscan init failed: {e}")
+    
+    def _candidate_patterns(self, text: str) -> set:
+        """Names of PATTERNS that may match text"""
+        # Cheap C-level membership checks rule out most patterns on benign text
+        has_digit = _DIGIT_RE.search(text) is not None
+        features = {
+            'at': '@' in text,
+            'digit': has_digit,
+            'digit_or_comma': has_digit or ',' in text,
+            'scheme': '://' in text,
+            'slash': '/' in text,
+        }
+        candidates = {name for name, feature in self._PATTERN_FEATURES.items() if features[feature]}
+        
+        # Hyperscan narrows the rest down to the patterns that really occur
+        if candidates and self._prefilter is not None:
+            hits = self._prefilter.scan(text)
+            if hits is not None:
+                return hits
+        return candidates
+    
+    def _findall(self, name: str, text: str, hits: Optional[set] = None) -> List[str]:
+        """findall for one of PATTERNS, skipped when the prefilter ruled it out"""
+        if hits is not None and name not in hits:
+            return []
+        return self._PATTERNS_RE[name].findall(text)
     
     def _deobfuscate(self, message: str) -> str:
         """Deobfuscate common patterns like 'p-a-y-t-m' -> 'paytm'"""
         result = message.lower()
-        for pattern, replacement in self.DEOBFUSCATION_MAP.items():
-            result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
+        for pattern, replacement in self._DEOBFUSCATION_RE:
+            result = pattern.sub(replacement, result)
         return result
     
-    def _extract_phone_numbers(self, message: str) -> List[str]:
+    def _extract_phone_numbers(self, message: str, hits: Optional[set] = None) -> List[str]:
         """Extract phone numbers including obfuscated ones"""
-        phones = set()
+        phones = {}  # Ordered set: first-seen order keeps forensics output reproducible
         
         # Standard patterns
         for pattern_name in ['phone', 'phone_spaced', 'phone_obfuscated']:
-            matches = re.findall(self.PATTERNS[pattern_name], message)
+            matches = self._findall(pattern_name, message, hits)
             for match in matches:
                 # Normalize: remove spaces, dashes, dots
-                clean = re.sub(r'[\s\-\.]', '', match)
+                clean = ''.join(match.split()).replace('-', '').replace('.', '')
                 # Remove +91 or leading 0
                 if clean.startswith('+91'):
                     clean = clean[3:]
@@ -147,56 +281,56 @@ class IntelligenceExtractor:
                 
                 # Validate: 10 digits starting with 6-9
                 if len(clean) == 10 and clean[0] in '6789':
-                    phones.add(clean)
+                    phones[clean] = None
         
         return list(phones)
     
-    def _extract_upis(self, message: str) -> List[ValidatedUPI]:
-        """Extract UPI IDs with bank provider validation"""
+    def _extract_upis(self, message: str, hits: Optional[set] = None) -> List[Dict]:
+        """Extract UPI IDs with bank provider validation (ValidatedUPI-shaped dicts)"""
         upis = []
         seen = set()
         
-        # Deobfuscate first
+        # Deobfuscate first (the result is already lowercase)
         clean_message = self._deobfuscate(message)
+        clean_hits = self._candidate_patterns(clean_message)
         
         # Extract standard UPIs
         for pattern_name in ['upi_standard', 'upi_general']:
-            matches = re.findall(self.PATTERNS[pattern_name], clean_message, re.IGNORECASE)
+            matches = self._findall(pattern_name, clean_message, clean_hits)
             for upi in matches:
-                upi = upi.lower()
                 # Validate: must have @ and not be email-like
                 if '@' in upi and not upi.endswith(('.com', '.in', '.org', '.net')):
                     if upi not in seen:
                         seen.add(upi)
                         # Validate and get bank provider
-                        validation = validate_upi(upi)
-                        upis.append(ValidatedUPI(**validation))
+                        upis.append(validate_upi(upi))
         
         # Also check original message
-        matches = re.findall(self.PATTERNS['upi_general'], message, re.IGNORECASE)
+        matches = self._findall('upi_general', message, hits)
         for upi in matches:
             upi = upi.lower()
             if '@' in upi and not upi.endswith(('.com', '.in', '.org', '.net')):
                 if upi not in seen:
                     seen.add(upi)
-                    validation = validate_upi(upi)
-                    upis.append(ValidatedUPI(**validation))
+                    upis.append(validate_upi(upi))
         
         return upis
     
-    def _extract_bank_accounts(self, message: str) -> List[BankAccount]:
-        """Extract bank account numbers with IFSC"""
+    def _extract_bank_accounts(self, message: str, hits: Optional[set] = None) -> List[Dict]:
+        """Extract bank account numbers with IFSC (BankAccount-shaped dicts)"""
         accounts = []
         seen_numbers = set()
         
         # Find account numbers (9-18 digits)
-        acc_matches = re.findall(self.PATTERNS['bank_account'], message)
-        ifsc_matches = re.findall(self.PATTERNS['ifsc'], message)
+        acc_matches = self._findall('bank_account', message, hits)
+        if not acc_matches:
+            return accounts
+        ifsc_matches = self._findall('ifsc', message, hits)
         
         # Detect bank name
         bank_name = 'unknown'
-        for name, pattern in self.BANK_NAMES.items():
-            if re.search(pattern, message, re.IGNORECASE):
+        for name, pattern in self._BANK_NAMES_RE:
+            if pattern.search(message):
                 bank_name = name
                 break
         
@@ -207,44 +341,46 @@ class IntelligenceExtractor:
             
             if acc_num not in seen_numbers:
                 seen_numbers.add(acc_num)
-                accounts.append(BankAccount(
-                    account_number=acc_num,
-                    ifsc=ifsc_matches[0] if ifsc_matches else None,
-                    bank_name=bank_name,
-                    confidence=0.9 if ifsc_matches else 0.7
-                ))
+                accounts.append({
+                    'account_number': acc_num,
+                    'ifsc': ifsc_matches[0] if ifsc_matches else None,
+                    'bank_name': bank_name,
+                    'confidence': 0.9 if ifsc_matches else 0.7,
+                    'account_type': None,
+                })
         
         return accounts
     
-    def _extract_urls(self, message: str) -> List[str]:
+    def _extract_urls(self, message: str, hits: Optional[set] = None) -> List[str]:
         """Extract URLs"""
-        urls = set()
+        urls = {}
         
         for pattern_name in ['url', 'short_url']:
-            matches = re.findall(self.PATTERNS[pattern_name], message)
-            urls.update(matches)
+            matches = self._findall(pattern_name, message, hits)
+            urls.update(dict.fromkeys(matches))
         
         return list(urls)
     
-    def _extract_amounts(self, message: str) -> List[str]:
+    def _extract_amounts(self, message: str, hits: Optional[set] = None) -> List[str]:
         """Extract monetary amounts"""
-        amounts = set()
+        amounts = {}
         
         for pattern_name in ['amount_rupee', 'amount_lakh', 'amount_crore']:
-            matches = re.findall(self.PATTERNS[pattern_name], message, re.IGNORECASE)
-            amounts.update(matches)
+            matches = self._findall(pattern_name, message, hits)
+            amounts.update(dict.fromkeys(matches))
         
         return list(amounts)
     
-    def _extract_emails(self, message: str) -> List[str]:
+    def _extract_emails(self, message: str, hits: Optional[set] = None) -> List[str]:
         """Extract email addresses"""
-        emails = set()
-        matches = re.findall(self.PATTERNS['email'], message)
+        emails = {}
+        matches = self._findall('email', message, hits)
         
         for email in matches:
+            email = email.lower()
             # Filter out UPI IDs
-            if not any(x in email.lower() for x in ['@paytm', '@ybl', '@okaxis', '@oksbi', '@upi']):
-                emails.add(email.lower())
+            if not any(x in email for x in ('@paytm', '@ybl', '@okaxis', '@oksbi', '@upi')):
+                emails[email] = None
         
         return list(emails)
     
@@ -253,100 +389,157 @@ class IntelligenceExtractor:
         Main extraction method
         Returns dict compatible with ExtractedEntities
         """
+        # Start the LLM request first and let it reach its network wait, so
+        # the regex pass runs while the request is in flight
+        llm_task = None
+        if self.llm_available or self.anthropic_client:
+            llm_task = asyncio.create_task(self._session_llm_extraction(message, session))
+            await asyncio.sleep(0)
+        
         # Step 1: Regex extraction with UPI validation
-        upi_list = self._extract_upis(message)
-        
-        extracted = {
-            'upi_ids': [upi.model_dump() for upi in upi_list],
-            'bank_accounts': [acc.model_dump() for acc in self._extract_bank_accounts(message)],
-            'phone_numbers': self._extract_phone_numbers(message),
-            'urls': self._extract_urls(message),
-            'amounts': self._extract_amounts(message),
-            'emails': self._extract_emails(message),
-        }
+        extracted = self._regex_extraction(message)
         
         # Step 2: LLM semantic extraction for complex cases
-        if self.llm_available or self.anthropic_client:
+        if llm_task:
             try:
-                llm_extracted = await self._llm_extraction(message)
+                llm_extracted = await llm_task
                 if llm_extracted:
-                    # Merge LLM results
-                    for key in ['upi_ids', 'phone_numbers', 'urls', 'emails']:
-                        if llm_extracted.get(key):
-                            for item in llm_extracted[key]:
-                                if item not in extracted[key]:
-                                    extracted[key].append(item)
-                    
-                    # Handle bank accounts specially
-                    if llm_extracted.get('bank_accounts'):
-                        existing_nums = [acc.get('account_number') for acc in extracted['bank_accounts']]
-                        for acc in llm_extracted['bank_accounts']:
-                            if isinstance(acc, dict) and acc.get('account_number') not in existing_nums:
-                                extracted['bank_accounts'].append(acc)
+                    self._merge_llm_extraction(extracted, llm_extracted)
             except Exception as e:
                 logger.error(f"LLM extraction failed: {e}")
         
+        self._log_extracted(extracted)
+        return extracted
+    
+    async def _session_llm_extraction(self, message: str, session: Dict) -> Optional[Dict]:
+        """Reuse the combined analysis if the detector already ran it for this message"""
+        task = CombinedLLMAnalyzer.session_analysis(message, session) if session else None
+        if task is not None:
+            analysis = await task
+            if analysis and analysis['intelligence'] is not None:
+                return analysis['intelligence']
+        return await self._llm_extraction(message)
+    
+    async def extract_batch(self, messages: List[str]) -> List[Dict]:
+        """
+        Extract from many standalone messages (evaluation / replay)
+        
+        LLM requests go together through the Message Batches API, so this
+        is for bulk work, not live turns.
+        """
+        results = [self._regex_extraction(message) for message in messages]
+        
+        if self.llm_available or self.anthropic_client:
+            llm_results = await self._llm_extraction_batch(messages)
+            for extracted, llm_extracted in zip(results, llm_results):
+                if llm_extracted:
+                    self._merge_llm_extraction(extracted, llm_extracted)
+        
+        for extracted in results:
+            self._log_extracted(extracted)
+        return results
+    
+    def _regex_extraction(self, message: str) -> Dict:
+        """Regex extraction with UPI validation"""
+        # Records are built as plain dicts in the model_dump() shape of
+        # ValidatedUPI / BankAccount - no model round trip per record
+        hits = self._candidate_patterns(message)
+        
+        return {
+            'upi_ids': self._extract_upis(message, hits),
+            'bank_accounts': self._extract_bank_accounts(message, hits),
+            'phone_numbers': self._extract_phone_numbers(message, hits),
+            'urls': self._extract_urls(message, hits),
+            'amounts': self._extract_amounts(message, hits),
+            'emails': self._extract_emails(message, hits),
+        }
+    
+    def _merge_llm_extraction(self, extracted: Dict, llm_extracted: Dict):
+        """Merge LLM results into the regex results in place"""
+        for key in ['upi_ids', 'phone_numbers', 'urls', 'emails']:
+            if llm_extracted.get(key):
+                for item in llm_extracted[key]:
+                    if item not in extracted[key]:
+                        extracted[key].append(item)
+        
+        # Handle bank accounts specially
+        if llm_extracted.get('bank_accounts'):
+            existing_nums = {acc.get('account_number') for acc in extracted['bank_accounts']}
+            for acc in llm_extracted['bank_accounts']:
+                if isinstance(acc, dict) and acc.get('account_number') not in existing_nums:
+                    extracted['bank_accounts'].append(acc)
+    
+    def _log_extracted(self, extracted: Dict):
         logger.info(
             f"Extracted: {len(extracted['upi_ids'])} UPIs, "
             f"{len(extracted['bank_accounts'])} accounts, "
             f"{len(extracted['phone_numbers'])} phones, "
             f"{len(extracted['urls'])} URLs"
         )
+    
+    def _anthropic_params(self, user_content: str) -> Dict:
+        """messages.create params for an extraction request"""
+        return {
+            "model": "claude-3-5-haiku-20241022",
+            "max_tokens": 200,
+            "temperature": 0.1,
+            "system": [{"type": "text", "text": _EXTRACT_SYSTEM, "cache_control": {"type": "ephemeral"}}],
+            "messages": [{"role": "user", "content": user_content}],
+        }
+    
+    async def _llm_extraction_batch(self, messages: List[str]) -> List[Optional[Dict]]:
+        """Semantic extraction for many messages, as one Anthropic batch when possible"""
+        if not self.anthropic_client:
+            results = []
+            for message in messages:
+                try:
+                    results.append(await self._llm_extraction(message))
+                except Exception as e:
+                    logger.error(f"LLM extraction failed: {e}")
+                    results.append(None)
+            return results
         
-        return extracted
+        texts = await run_message_batch(
+            self.anthropic_client,
+            [self._anthropic_params(f'Message: "{message}"') for message in messages]
+        )
+        results = []
+        for text in texts:
+            try:
+                results.append(parse_json_response(text) if text else None)
+            except Exception as e:
+                logger.error(f"Anthropic batch extraction failed: {e}")
+                results.append(None)
+        return results
     
     async def _llm_extraction(self, message: str) -> Optional[Dict]:
         """Use LLM for semantic extraction"""
-        prompt = f"""Extract financial and contact information from this message.
-Look for obfuscated data like "p-a-y-t-m" = paytm, spaced phone numbers, etc.
-
-Message: "{message}"
-
-Return JSON only (no markdown):
-{{"upi_ids": [], "bank_accounts": [{{"account_number": "", "ifsc": "", "bank_name": ""}}], "phone_numbers": [], "urls": [], "emails": []}}
-
-If nothing found, return empty arrays."""
+        prompt = _EXTRACT_PROMPT.format(message=message)
 
         # Try Gemini
         if self.llm_available:
             try:
                 if self._use_new_sdk:
-                    response = self.genai_client.models.generate_content(
+                    response = await self.genai_client.aio.models.generate_content(
                         model=self.model,
                         contents=prompt
                     )
                     result_text = response.text.strip()
                 else:
-                    import google.generativeai as genai
-                    model = genai.GenerativeModel(self.model)
-                    response = model.generate_content(prompt)
+                    response = await get_legacy_model(self.model).generate_content_async(prompt)
                     result_text = response.text.strip()
                 
-                # Clean markdown
-                if '```' in result_text:
-                    result_text = result_text.split('```')[1]
-                    if result_text.startswith('json'):
-                        result_text = result_text[4:]
-                
-                return json.loads(result_text)
+                return parse_json_response(result_text)
             except Exception as e:
                 logger.error(f"Gemini extraction failed: {e}")
         
         # Try Anthropic
         if self.anthropic_client:
             try:
-                response = self.anthropic_client.messages.create(
-                    model="claude-3-5-haiku-20241022",
-                    max_tokens=200,
-                    temperature=0.1,
-                    messages=[{"role": "user", "content": prompt}]
-                )
+                response = await self.anthropic_client.messages.create(**self._anthropic_params(f'Message: "{message}"'))
+                logger.debug("Anthropic extraction cache read: %s tokens", response.usage.cache_read_input_tokens or 0)
                 result_text = response.content[0].text.strip()
-                if '```' in result_text:
-                    result_text = result_text.split('```')[1]
-                    if result_text.startswith('json'):
-                        result_text = result_text[4:]
-                return json.loads(result_text)
+                return parse_json_response(result_text)
             except Exception as e:
                 logger.error(f"Anthropic extraction failed: {e}")
         
@@ -355,8 +548,6 @@ If nothing found, return empty arrays."""
 
 # Standalone test
 if __name__ == "__main__":
-    import asyncio
-    
     extractor = IntelligenceExtractor()
     
     test_messages = [
@@ -368,9 +559,9 @@ if __name__ == "__main__":
     ]
     
     async def test():
-        for msg in test_messages:
+        results = await extractor.extract_batch(test_messages)
+        for msg, result in zip(test_messages, results):
             print(f"\nMessage: {msg}")
-            result = await extractor.extract_intelligence(msg, {})
             print(f"Extracted: {json.dumps(result, indent=2)}")
     
     asyncio.run(test())
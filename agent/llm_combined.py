@@ -0,0 +1,153 @@
+"""
+Combined LLM Analysis
+One LLM call that both classifies a message and extracts intelligence from it,
+shared by the detector and extractor instead of two prompts per message
+"""
+
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+from agent._anthropic import get_async_anthropic_client
+from agent._gemini import get_genai_client, get_legacy_model
+from agent.llm_utils import history_messages, parse_json_response
+
+logger = logging.getLogger(__name__)
+
+# Fixed instructions; the message goes last so Anthropic can cache this prefix
+_ANALYZE_SYSTEM = """Analyze the user's latest message (earlier turns are context): decide if it is a scam attempt and extract any financial and contact information from it.
+
+For classification look for:
+1. Impersonation (bank, govt, company, courier)
+2. Urgency/threats
+3. Financial requests
+4. Suspicious links/contacts
+
+For extraction look for obfuscated data like "p-a-y-t-m" = paytm, spaced phone numbers, etc.
+
+Respond with JSON only (no markdown):
+{"detection": {"is_scam": true/false, "confidence": 0.0-1.0, "scam_type": "type or unknown"}, "intelligence": {"upi_ids": [], "bank_accounts": [{"account_number": "", "ifsc": "", "bank_name": ""}], "phone_numbers": [], "urls": [], "emails": []}}
+
+Use empty arrays when nothing is found."""
+
+# Single-prompt form for Gemini, built once; only message/context are filled per call
+_ANALYZE_PROMPT = (
+    _ANALYZE_SYSTEM.replace('{', '{{').replace('}', '}}')
+    + '\n\nMessage: "{message}"\n\nContext:\n{context}'
+)
+
+
+class CombinedLLMAnalyzer:
+    """
+    Classification + extraction in a single request
+    
+    Results are memoized on the session per message (session['_llm_analysis']),
+    so whichever of detector/extractor asks second reuses the first call.
+    """
+    
+    def __init__(self):
+        """Initialize LLM clients"""
+        # Try to initialize Gemini (primary)
+        self.gemini_model = None
+        self.genai_client = None
+        google_key = os.getenv('GOOGLE_API_KEY')
+        if google_key:
+            try:
+                self.genai_client = get_genai_client(google_key)
+                self.gemini_model = "gemini-2.0-flash"
+            except ImportError:
+                # Fallback to old SDK
+                try:
+                    import google.generativeai as genai_old
+                    genai_old.configure(api_key=google_key)
+                    self.gemini_model = "gemini-1.5-flash"
+                except Exception as e:
+                    logger.warning(f"Gemini (legacy) init failed: {e}")
+            except Exception as e:
+                logger.warning(f"Gemini init failed: {e}")
+        
+        # Try to initialize Anthropic (fallback)
+        self.anthropic_client = get_async_anthropic_client()
+    
+    @property
+    def available(self) -> bool:
+        return bool(self.gemini_model or self.anthropic_client)
+    
+    @staticmethod
+    def session_analysis(message: str, session: Dict) -> Optional[asyncio.Task]:
+        """The analysis already started for this message in this session, if any"""
+        memo = session.get('_llm_analysis')
+        if memo and memo['message'] == message:
+            return memo['task']
+        return None
+    
+    async def analyze_for_session(self, message: str, session: Dict) -> Optional[Dict]:
+        """Analyze a message once per session turn; concurrent callers share the call"""
+        task = self.session_analysis(message, session)
+        if task is None:
+            task = asyncio.create_task(
+                self.analyze(message, session.get('conversation_history', []))
+            )
+            session['_llm_analysis'] = {'message': message, 'task': task}
+        return await task
+    
+    async def analyze(self, message: str, conversation_history: List[Dict]) -> Optional[Dict]:
+        """Returns {'detection': {...}, 'intelligence': {...}} or None"""
+        context = "\n".join([
+            f"{msg['role']}: {msg['message']}"
+            for msg in conversation_history[-3:]
+        ]) if conversation_history else "No prior context"
+        prompt = _ANALYZE_PROMPT.format(message=message, context=context)
+        
+        # Try Gemini first
+        if self.gemini_model:
+            try:
+                if self.genai_client:
+                    # New SDK
+                    response = await self.genai_client.aio.models.generate_content(
+                        model=self.gemini_model,
+                        contents=prompt
+                    )
+                else:
+                    # Legacy SDK
+                    response = await get_legacy_model(self.gemini_model).generate_content_async(prompt)
+                return self._validate(parse_json_response(response.text.strip()))
+            except Exception as e:
+                logger.error(f"Gemini combined analysis failed: {e}")
+        
+        # Try Anthropic as fallback
+        if self.anthropic_client:
+            try:
+                response = await self.anthropic_client.messages.create(
+                    model="claude-3-5-haiku-20241022",
+                    max_tokens=300,
+                    temperature=0.1,
+                    system=[{"type": "text", "text": _ANALYZE_SYSTEM, "cache_control": {"type": "ephemeral"}}],
+                    messages=history_messages(conversation_history[-3:], f'Message: "{message}"')
+                )
+                logger.debug("Anthropic combined analysis cache read: %s tokens", response.usage.cache_read_input_tokens or 0)
+                return self._validate(parse_json_response(response.content[0].text.strip()))
+            except Exception as e:
+                logger.error(f"Anthropic combined analysis failed: {e}")
+        
+        return None
+    
+    def _validate(self, result) -> Dict:
+        if not isinstance(result, dict):
+            raise ValueError("combined analysis is not a JSON object")
+        return {
+            'detection': result.get('detection') if isinstance(result.get('detection'), dict) else None,
+            'intelligence': result.get('intelligence') if isinstance(result.get('intelligence'), dict) else None,
+        }
+
+
+_analyzer: Optional[CombinedLLMAnalyzer] = None
+
+
+def get_combined_analyzer() -> CombinedLLMAnalyzer:
+    """Shared analyzer instance (created on first use)"""
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = CombinedLLMAnalyzer()
+    return _analyzer
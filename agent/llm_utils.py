@@ -0,0 +1,105 @@
+"""
+LLM Utilities
+Shared helpers for parsing LLM output and bulk Anthropic requests
+"""
+
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Seconds between Message Batches status checks
+BATCH_POLL_INTERVAL = 5.0
+
+# Body of the first markdown code fence (an unclosed fence runs to the end)
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*(?:```|$)', re.DOTALL)
+
+
+def parse_json_response(result_text: str) -> Dict:
+    """Parse a JSON reply, stripping a markdown code fence if present"""
+    match = _JSON_FENCE_RE.search(result_text)
+    if match:
+        result_text = match.group(1)
+    return orjson.loads(result_text)
+
+
+def history_messages(conversation_history: List[Dict], current: str) -> List[Dict]:
+    """
+    Anthropic messages for a conversation ending with `current` as the user turn
+    
+    Scammer turns become user messages and agent turns assistant messages
+    (consecutive same-role turns merged). The turn before `current` carries a
+    cache breakpoint, so on the next call the whole prior prefix is cached.
+    """
+    messages = []
+    for turn in conversation_history:
+        text = turn.get('message', '')
+        if not text:
+            continue
+        role = 'user' if turn.get('role') == 'scammer' else 'assistant'
+        if not messages and role == 'assistant':
+            continue  # Must start with a user turn
+        if messages and messages[-1]['role'] == role:
+            messages[-1]['content'] += f"\n{text}"
+        else:
+            messages.append({'role': role, 'content': text})
+    
+    if messages and messages[-1]['role'] == 'user':
+        messages[-1]['content'] += f"\n{current}"
+    else:
+        messages.append({'role': 'user', 'content': current})
+    
+    if len(messages) >= 2:
+        prior = messages[-2]
+        prior['content'] = [{"type": "text", "text": prior['content'], "cache_control": {"type": "ephemeral"}}]
+    return messages
+
+
+async def run_message_batch(client, requests: List[Dict]) -> List[Optional[str]]:
+    """
+    Run Anthropic messages.create params through the Message Batches API
+    (client is an AsyncAnthropic).
+    
+    Batches are billed at half price and are meant for bulk/offline work
+    (evaluation, replay), not live turns - results can take minutes.
+    Returns reply texts in request order; None where a request failed.
+    """
+    if not requests:
+        return []
+    
+    if not hasattr(client.messages, 'batches'):
+        # Older SDKs: fall back to one request at a time
+        texts = []
+        for params in requests:
+            try:
+                response = await client.messages.create(**params)
+                texts.append(response.content[0].text.strip())
+            except Exception as e:
+                logger.error(f"Anthropic request failed: {e}")
+                texts.append(None)
+        return texts
+    
+    batch = await client.messages.batches.create(requests=[
+        {"custom_id": f"req-{i}", "params": params}
+        for i, params in enumerate(requests)
+    ])
+    logger.info(f"Submitted message batch {batch.id} ({len(requests)} requests)")
+    
+    while batch.processing_status != "ended":
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        batch = await client.messages.batches.retrieve(batch.id)
+    
+    texts: List[Optional[str]] = [None] * len(requests)
+    async for entry in await client.messages.batches.results(batch.id):
+        index = int(entry.custom_id.split('-', 1)[1])
+        if entry.result.type == "succeeded":
+            texts[index] = entry.result.message.content[0].text.strip()
+        else:
+            logger.error(f"Batch request {entry.custom_id} {entry.result.type}")
+    
+    logger.info(f"✓ Message batch {batch.id} finished")
+    return texts
@@ -6,10 +6,14 @@ Track competition-relevant metrics
 from typing import Dict, List
 import logging
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
 
 logger = logging.getLogger(__name__)
 
+# Events kept per series; older ones fall out of the ring, so memory stays
+# flat however long the server runs (summaries cover this window)
+METRICS_WINDOW = 10000
+
 
 class MetricsCollector:
     """
@@ -18,11 +22,15 @@ class MetricsCollector:
     
     def __init__(self):
         """Initialize metrics storage"""
-        self.metrics = {
-            'interactions': [],
-            'detections': [],
+        self.metrics = self._empty_metrics()
+    
+    @staticmethod
+    def _empty_metrics() -> Dict:
+        return {
+            'interactions': deque(maxlen=METRICS_WINDOW),
+            'detections': deque(maxlen=METRICS_WINDOW),
             'phases': defaultdict(int),
-            'intelligence_scores': []
+            'intelligence_scores': deque(maxlen=METRICS_WINDOW)
         }
     
     async def log_interaction(
@@ -46,7 +54,7 @@ class MetricsCollector:
         self.metrics['interactions'].append(interaction)
         self.metrics['phases'][phase] += 1
         
-        logger.debug(f"Logged interaction: {session_id} - {latency*1000:.0f}ms - {phase}")
+        logger.debug("Logged interaction: %s - %.0fms - %s", session_id, latency*1000, phase)
     
     async def log_detection(
         self,
@@ -67,7 +75,7 @@ class MetricsCollector:
         }
         
         self.metrics['detections'].append(detection)
-        logger.debug(f"Logged detection: {session_id} - scam={is_scam} ({confidence:.2f})")
+        logger.debug("Logged detection: %s - scam=%s (%.2f)", session_id, is_scam, confidence)
     
     async def log_intelligence_score(
         self,
@@ -86,7 +94,7 @@ class MetricsCollector:
             'intelligence': intelligence
         })
         
-        logger.debug(f"Intelligence score for {session_id}: {score:.1f}/100")
+        logger.debug("Intelligence score for %s: %.1f/100", session_id, score)
     
     def _calculate_intelligence_score(self, intelligence: Dict) -> float:
         """
@@ -219,7 +227,7 @@ class MetricsCollector:
                 sum(i['latency_ms'] for i in session_interactions) / len(session_interactions)
                 if session_interactions else 0
             ),
-            'phases_visited': list(set(i['phase'] for i in session_interactions)),
+            'phases_visited': list(dict.fromkeys(i['phase'] for i in session_interactions)),
             'scam_detected': any(d['is_scam'] for d in session_detections),
             'intelligence_score': (
                 session_intel[-1]['score'] if session_intel else 0
@@ -230,12 +238,7 @@ class MetricsCollector:
         """
         Reset all metrics (for testing)
         """
-        self.metrics = {
-            'interactions': [],
-            'detections': [],
-            'phases': defaultdict(int),
-            'intelligence_scores': []
-        }
+        self.metrics = self._empty_metrics()
         logger.info("Metrics reset")
 
 
@@ -6,7 +6,7 @@ Enhanced with UPI validation, typing delays, and intelligence scoring
 from pydantic import BaseModel, Field, field_validator, computed_field
 from typing import List, Dict, Optional, Literal
 from datetime import datetime
-import re
+import string
 
 
 # =============================================================================
@@ -60,17 +60,18 @@ UPI_PROVIDERS = {
 
 def validate_upi(upi_id: str) -> Dict:
     """Validate UPI ID and extract bank provider info"""
-    upi_lower = upi_id.lower()
-    
-    for suffix, info in UPI_PROVIDERS.items():
-        if upi_lower.endswith(suffix):
-            return {
-                'upi_id': upi_id,
-                'bank_provider': info['bank'],
-                'provider_type': info['type'],
-                'verified': True,
-                'confidence': 0.95
-            }
+    # Every provider key is '@' + handle, so a suffix match is a lookup of
+    # everything after the last '@'
+    _, at, handle = upi_id.lower().rpartition('@')
+    info = UPI_PROVIDERS.get(at + handle) if at else None
+    if info:
+        return {
+            'upi_id': upi_id,
+            'bank_provider': info['bank'],
+            'provider_type': info['type'],
+            'verified': True,
+            'confidence': 0.95
+        }
     
     # Unknown provider
     if '@' in upi_id:
@@ -96,9 +97,12 @@ def validate_upi(upi_id: str) -> Dict:
 # Input Models
 # =============================================================================
 
+_SESSION_ID_CHARS = frozenset(string.ascii_letters + string.digits + '_-')
+
+
 class MessageRequest(BaseModel):
     """Incoming message from scammer"""
-    session_id: str = Field(..., min_length=1, max_length=100)
+    session_id: str = Field(default="default", min_length=1, max_length=100)
     message: str = Field(..., min_length=1, max_length=5000)
     timestamp: Optional[str] = None
     
@@ -113,7 +117,7 @@ class MessageRequest(BaseModel):
     @classmethod
     def validate_session_id(cls, v: str) -> str:
         """Validate session ID format"""
-        if not re.match(r'^[a-zA-Z0-9_-]+$', v):
+        if not _SESSION_ID_CHARS.issuperset(v):
             raise ValueError('Session ID must be alphanumeric with hyphens/underscores only')
         return v
 
@@ -347,6 +351,32 @@ class SessionState(BaseModel):
     engagement_metrics: Dict = Field(default_factory=dict)
 
 
+# =============================================================================
+# LLM Structured Output
+# =============================================================================
+
+class LLMBankAccount(BaseModel):
+    """Bank account as returned by the LLM (no defaults - Gemini schemas reject them)"""
+    account_number: str
+    ifsc: str
+    bank_name: str
+
+
+class LLMIntelligence(BaseModel):
+    """Intelligence as returned by the LLM, merged by the extractor"""
+    upi_ids: List[str]
+    bank_accounts: List[LLMBankAccount]
+    phone_numbers: List[str]
+    urls: List[str]
+    emails: List[str]
+
+
+class TurnOutput(BaseModel):
+    """Fused reply + extraction Gemini output (FUSED_TURN=1)"""
+    reply: str
+    intelligence: LLMIntelligence
+
+
 # =============================================================================
 # Legacy Compatibility
 # =============================================================================
@@ -5,18 +5,70 @@ Enhanced with typing delays and adversarial confusion tactics
 Uses google.genai SDK (new) with Anthropic fallback
 """
 
+from collections import OrderedDict, deque
+from contextlib import nullcontext
 from enum import Enum
-from typing import Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
 import random
 import logging
 import os
 import json
 import re
+import weakref
 
-from agent.models import DetectionResult, ExtractedEntities, TypingBehavior
+from agent.models import DetectionResult, ExtractedEntities, TurnOutput, TypingBehavior
+from agent._anthropic import get_async_anthropic_client
+from agent._gemini import get_genai_client, get_legacy_model
+from agent.llm_combined import CombinedLLMAnalyzer
+from agent.llm_utils import parse_json_response
+from agent.regex_engine import compile_pattern
+from agent.semantic_cache import GENERATIVE_THRESHOLD, GenerativeCache, SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# Max Gemini replies kept for exact prompt repeats
+RESPONSE_CACHE_SIZE = 2048
+
+# Max LLM requests in flight per process; excess turns wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 32))
+
+# Opt-in: one extra LLM call per phase to summarize turns older than the
+# prompt window, so later phases keep early context (HISTORY_SUMMARY=1)
+USE_HISTORY_SUMMARY = os.getenv('HISTORY_SUMMARY', '0') == '1'
+
+# Opt-in: one Gemini call (new SDK) returns both the reply and the intelligence
+# in the scammer's message, so the extractor skips its own LLM call (FUSED_TURN=1)
+USE_FUSED_TURN = os.getenv('FUSED_TURN', '0') == '1'
+
+# Appended to the reply preamble for the fused call
+_FUSED_SUFFIX = """
+
+Also extract any financial and contact information from the scammer's latest message. Look for obfuscated data like "p-a-y-t-m" = paytm, spaced phone numbers, etc.
+
+Respond with JSON only:
+{"reply": "your spoken response", "intelligence": {"upi_ids": [], "bank_accounts": [{"account_number": "", "ifsc": "", "bank_name": ""}], "phone_numbers": [], "urls": [], "emails": []}}
+
+Use empty arrays when nothing is found."""
+
+# Turns of conversation sent verbatim in the reply prompt
+HISTORY_WINDOW = 5
+
+_SUMMARY_SYSTEM = """You are summarizing a phone conversation between a suspected scammer and the person they called.
+
+In at most 60 words, state who the caller claims to be, what they want, and any payment details, phone numbers or links they gave. Plain text only, no preamble."""
+
+_FRUSTRATION_PRIORITY = {'none': 0, 'low': 1, 'medium': 2, 'high': 3}
+
+# Start of an LLM reply: a speaker label the model copied from the transcript
+# ("AGENT: ...") and the opening quote, if any, of a quoted reply
+_REPLY_HEAD_RE = re.compile(r'\s*(?:(?:agent|assistant)\s*:\s*)?("?)', re.IGNORECASE)
+
+# Characters of a streamed reply to buffer before matching _REPLY_HEAD_RE
+_REPLY_HEAD_LEN = 16
+
 
 # =============================================================================
 # CONVERSATION PHASES
@@ -31,25 +83,74 @@ class ConversationPhase(str, Enum):
     CLOSING = "closing"
 
 
+# Phase transition rules: (session, turn count, intelligence) -> (next phase, log note) or None
+def _advance_initial_contact(session: Dict, turn_count: int, intel: Dict):
+    if session.get('scam_detected'):
+        return ConversationPhase.TRUST_BUILDING, ""
+
+
+def _advance_trust_building(session: Dict, turn_count: int, intel: Dict):
+    if turn_count >= 3:
+        return ConversationPhase.HONEY_TOKEN_BAIT, ""
+
+
+def _advance_honey_token_bait(session: Dict, turn_count: int, intel: Dict):
+    if turn_count >= 6:
+        return ConversationPhase.EXTRACTION, ""
+
+
+def _advance_extraction(session: Dict, turn_count: int, intel: Dict):
+    # Check if we have enough intel
+    has_upi = len(intel.get('upi_ids', [])) > 0
+    has_bank = len(intel.get('bank_accounts', [])) > 0
+    has_phone = len(intel.get('phone_numbers', [])) > 0
+    has_multiple = (len(intel.get('upi_ids', [])) + len(intel.get('bank_accounts', []))) >= 2
+    
+    if has_multiple and has_phone and turn_count >= 10:
+        return ConversationPhase.CLOSING, " (excellent intel)"
+    elif has_multiple and turn_count >= 12:
+        return ConversationPhase.CLOSING, " (good intel)"
+    elif (has_upi or has_bank) and turn_count >= 16:
+        return ConversationPhase.CLOSING, " (extended)"
+
+
+# Keyed by phase value: sessions hold either the enum or its plain string
+_PHASE_TRANSITIONS = MappingProxyType({
+    ConversationPhase.INITIAL_CONTACT.value: _advance_initial_contact,
+    ConversationPhase.TRUST_BUILDING.value: _advance_trust_building,
+    ConversationPhase.HONEY_TOKEN_BAIT.value: _advance_honey_token_bait,
+    ConversationPhase.EXTRACTION.value: _advance_extraction,
+})
+
+
 # =============================================================================
 # PERSONAS
 # =============================================================================
 
+def _first_token_mentioning(tokens: Tuple[str, ...], *words: str) -> Optional[str]:
+    """First honey token containing any of `words` (case-insensitive)"""
+    for token in tokens:
+        lowered = token.lower()
+        if any(word in lowered for word in words):
+            return token
+    return None
+
+
 class Persona:
     """Dynamic persona for engaging scammers"""
     
-    PERSONAS = {
+    PERSONAS = MappingProxyType({
         'elderly_tech_illiterate': {
             'name': 'Elderly Tech-Illiterate',
             'description': 'A retired person (65+) with limited tech knowledge. Trusting, polite, easily confused.',
             'speech_style': 'Polite, simple language, often says "beta", "Could you help me?", "I don\'t understand this technology"',
             'traits': ['confused', 'trusting', 'polite', 'asks for help', 'slow to understand'],
             'best_for': ['bank_impersonation', 'lottery', 'courier', 'tax_refund', 'utility'],
-            'honey_tokens': [
+            'honey_tokens': (
                 "I want to pay but I don't know how to use this UPI. What's your UPI ID again?",
                 "My grandson usually helps me. But he's not here. Can you tell me your bank account?",
                 "This phone is confusing. What's your phone number? I'll call you.",
-            ]
+            )
         },
         'distracted_professional': {
             'name': 'Distracted Professional',
@@ -57,11 +158,11 @@ class Persona:
             'speech_style': 'Rushed, "I\'m in a meeting", "Can you be quick?", "Hold on, my boss is calling"',
             'traits': ['busy', 'distracted', 'impatient', 'wants quick fix', 'moderate tech knowledge'],
             'best_for': ['investment', 'tech_support', 'job_offer'],
-            'honey_tokens': [
+            'honey_tokens': (
                 "Look, I'm busy. Just give me your UPI ID and I'll transfer when I'm free.",
                 "My meeting is about to start. What's your account number? I'll do NEFT.",
                 "I don't have time for this. Give me a backup UPI in case the first one fails.",
-            ]
+            )
         },
         'eager_job_seeker': {
             'name': 'Eager Job Seeker',
@@ -69,11 +170,11 @@ class Persona:
             'speech_style': 'Excited, grateful, "Thank you so much!", "I really need this job"',
             'traits': ['desperate', 'grateful', 'cooperative', 'trusting', 'eager to please'],
             'best_for': ['job_offer'],
-            'honey_tokens': [
+            'honey_tokens': (
                 "I'll pay immediately! What's your UPI ID? I don't want to lose this opportunity!",
                 "Should I transfer to your bank? Give me the account details please!",
                 "Can I have your contact number? I want to stay in touch about the job.",
-            ]
+            )
         },
         'worried_account_holder': {
             'name': 'Worried Account Holder',
@@ -81,46 +182,63 @@ class Persona:
             'speech_style': 'Anxious, "Oh my god!", "Is my money safe?", asks many questions',
             'traits': ['anxious', 'worried', 'asks questions', 'somewhat careful', 'emotional'],
             'best_for': ['bank_impersonation', 'tech_support'],
-            'honey_tokens': [
+            'honey_tokens': (
                 "Wait, I need to verify this is real. What's your official phone number?",
                 "My app is showing error. Can you give me another UPI ID? Or bank account?",
                 "I want to pay but first tell me your employee ID and branch code.",
-            ]
+            )
         }
-    }
+    })
+    
+    # persona_id -> honey token asking for (UPI, bank account, phone number)
+    GAP_TOKENS = MappingProxyType({
+        persona_id: (
+            _first_token_mentioning(persona['honey_tokens'], 'upi'),
+            _first_token_mentioning(persona['honey_tokens'], 'account', 'bank'),
+            _first_token_mentioning(persona['honey_tokens'], 'phone', 'number'),
+        )
+        for persona_id, persona in PERSONAS.items()
+    })
     
     @classmethod
     def select_for_scam(cls, scam_type: str) -> str:
         """Select best persona for the detected scam type"""
         for persona_id, persona in cls.PERSONAS.items():
             if scam_type in persona.get('best_for', []):
-                logger.info(f"Selected persona '{persona_id}' for scam type '{scam_type}'")
+                logger.info("Selected persona '%s' for scam type '%s'", persona_id, scam_type)
                 return persona_id
         
         # Default to elderly for unknown scams
-        logger.info(f"Defaulting to 'elderly_tech_illiterate' for scam type '{scam_type}'")
+        logger.info("Defaulting to 'elderly_tech_illiterate' for scam type '%s'", scam_type)
         return 'elderly_tech_illiterate'
     
     @classmethod
     def get_honey_token(cls, persona_id: str, intelligence: ExtractedEntities) -> Optional[str]:
         """Get a honey token bait based on what intelligence we're missing"""
-        persona = cls.PERSONAS.get(persona_id, cls.PERSONAS['elderly_tech_illiterate'])
-        tokens = persona.get('honey_tokens', [])
+        return cls.honey_token_for_gaps(persona_id, (
+            not intelligence.upi_ids,
+            not intelligence.bank_accounts,
+            not intelligence.phone_numbers,
+        ))
+    
+    @classmethod
+    def honey_token_for_gaps(cls, persona_id: str, gaps: Tuple[bool, bool, bool]) -> Optional[str]:
+        """Honey token for (missing UPI, missing bank account, missing phone)"""
+        if persona_id not in cls.PERSONAS:
+            persona_id = 'elderly_tech_illiterate'
+        upi_token, bank_token, phone_token = cls.GAP_TOKENS[persona_id]
+        
+        missing_upi, missing_bank, missing_phone = gaps
         
         # Prioritize based on missing intel
-        if not intelligence.upi_ids:
-            for token in tokens:
-                if 'upi' in token.lower():
-                    return token
-        if not intelligence.bank_accounts:
-            for token in tokens:
-                if 'account' in token.lower() or 'bank' in token.lower():
-                    return token
-        if not intelligence.phone_numbers:
-            for token in tokens:
-                if 'phone' in token.lower() or 'number' in token.lower():
-                    return token
+        if missing_upi and upi_token:
+            return upi_token
+        if missing_bank and bank_token:
+            return bank_token
+        if missing_phone and phone_token:
+            return phone_token
         
+        tokens = cls.PERSONAS[persona_id]['honey_tokens']
         return random.choice(tokens) if tokens else None
 
 
@@ -137,12 +255,15 @@ class LLMClient:
         self.genai_client = None
         self.anthropic_client = None
         
+        # sha256(prompt) -> reply, least recently used first
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        
         # Try new google.genai SDK
         google_key = os.getenv('GOOGLE_API_KEY')
         if google_key:
             try:
-                from google import genai
-                self.genai_client = genai.Client(api_key=google_key)
+                self.genai_client = get_genai_client(google_key)
                 self.gemini_model = "gemini-2.0-flash"
                 self.gemini_available = True
                 self._use_new_sdk = True
@@ -162,41 +283,50 @@ class LLMClient:
                 logger.warning(f"Gemini init failed: {e}")
         
         # Try Anthropic
-        anthropic_key = os.getenv('ANTHROPIC_API_KEY')
-        if anthropic_key:
-            try:
-                from anthropic import Anthropic
-                self.anthropic_client = Anthropic(api_key=anthropic_key)
-                self.anthropic_available = True
-                logger.info("✓ Anthropic initialized for orchestrator fallback")
-            except Exception as e:
-                logger.warning(f"Anthropic init failed: {e}")
+        self.anthropic_client = get_async_anthropic_client()
+        if self.anthropic_client:
+            self.anthropic_available = True
+            logger.info("✓ Anthropic initialized for orchestrator fallback")
     
-    def generate(self, prompt: str) -> tuple[Optional[str], str]:
+    async def generate(self, prompt: str, system: Optional[str] = None) -> tuple[Optional[str], str]:
         """
         Generate response with fallback chain.
         Returns (response, llm_used) where llm_used is "gemini", "anthropic", or "template"
+        
+        `system` is the fixed instruction preamble, sent as a system
+        instruction (and as a cached system block to Anthropic) so only
+        `prompt` varies between turns.
+        
+        Gemini runs at temperature 0, so its reply to an identical prompt is
+        served from an in-process LRU cache instead of a new request.
         """
         # Try Gemini first
         if self.gemini_available:
+            cache_key = hashlib.sha256(f"{system}\x00{prompt}".encode()).hexdigest()
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self._response_cache.move_to_end(cache_key)
+                logger.info("Gemini response (cached): %.50s...", cached)
+                return cached, "gemini"
+            
             try:
-                if self._use_new_sdk:
-                    response = self.genai_client.models.generate_content(
-                        model=self.gemini_model,
-                        contents=prompt
-                    )
-                    text = response.text.strip()
-                else:
-                    import google.generativeai as genai
-                    model = genai.GenerativeModel(self.gemini_model)
-                    response = model.generate_content(prompt)
-                    text = response.text.strip()
+                async with self._slots:
+                    if self._use_new_sdk:
+                        response = await self.genai_client.aio.models.generate_content(
+                            model=self.gemini_model,
+                            contents=prompt,
+                            config={"temperature": 0.0, "system_instruction": system}
+                        )
+                    else:
+                        model = get_legacy_model(self.gemini_model, system, 0.0)
+                        response = await model.generate_content_async(prompt)
+                text = _clean_reply(response.text)
                 
-                # Clean up quotes
-                if text.startswith('"') and text.endswith('"'):
-                    text = text[1:-1]
+                self._response_cache[cache_key] = text
+                if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                    self._response_cache.popitem(last=False)
                 
-                logger.info(f"Gemini response: {text[:50]}...")
+                logger.info("Gemini response: %.50s...", text)
                 return text, "gemini"
             except Exception as e:
                 logger.error(f"Gemini generation failed: {e}")
@@ -204,27 +334,194 @@ class LLMClient:
         # Try Anthropic as fallback
         if self.anthropic_available:
             try:
-                response = self.anthropic_client.messages.create(
-                    model="claude-3-5-haiku-20241022",
-                    max_tokens=200,
-                    temperature=0.7,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                text = response.content[0].text.strip()
-                if text.startswith('"') and text.endswith('"'):
-                    text = text[1:-1]
-                logger.info(f"Anthropic response: {text[:50]}...")
+                params = {}
+                if system:
+                    params["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+                async with self._slots:
+                    response = await self.anthropic_client.messages.create(
+                        model="claude-3-5-haiku-20241022",
+                        max_tokens=200,
+                        temperature=0.7,
+                        messages=[{"role": "user", "content": prompt}],
+                        **params
+                    )
+                text = _clean_reply(response.content[0].text)
+                logger.info("Anthropic response: %.50s...", text)
                 return text, "anthropic"
             except Exception as e:
                 logger.error(f"Anthropic generation failed: {e}")
         
         return None, "template"
+    
+    async def generate_json(self, prompt: str, system: str, schema) -> Optional[Dict]:
+        """
+        One Gemini JSON-mode call constrained to `schema` (a pydantic model)
+        
+        New SDK only and not cached; returns the parsed object, or None if
+        Gemini is unavailable or the call failed.
+        """
+        if not (self.gemini_available and self._use_new_sdk):
+            return None
+        try:
+            async with self._slots:
+                response = await self.genai_client.aio.models.generate_content(
+                    model=self.gemini_model,
+                    contents=prompt,
+                    config={
+                        "temperature": 0.0,
+                        "system_instruction": system,
+                        "response_mime_type": "application/json",
+                        "response_schema": schema,
+                    }
+                )
+            return parse_json_response(response.text.strip())
+        except Exception as e:
+            logger.error(f"Gemini JSON generation failed: {e}")
+            return None
+    
+    async def generate_stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[Tuple[str, str]]:
+        """
+        generate(), streamed: yields (text chunk, llm_used) as tokens arrive
+        
+        Anthropic is tried only if Gemini fails before sending anything (sent
+        text can't be taken back). Yields nothing if no LLM replied.
+        """
+        # Try Gemini first
+        if self.gemini_available:
+            cache_key = hashlib.sha256(f"{system}\x00{prompt}".encode()).hexdigest()
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self._response_cache.move_to_end(cache_key)
+                yield cached, "gemini"
+                return
+            
+            cleaner = _StreamQuoteStripper()
+            try:
+                async with self._slots:
+                    if self._use_new_sdk:
+                        chunks = await self.genai_client.aio.models.generate_content_stream(
+                            model=self.gemini_model,
+                            contents=prompt,
+                            config={"temperature": 0.0, "system_instruction": system}
+                        )
+                    else:
+                        model = get_legacy_model(self.gemini_model, system, 0.0)
+                        chunks = await model.generate_content_async(prompt, stream=True)
+                    
+                    async for chunk in chunks:
+                        text = cleaner.feed(chunk.text or "")
+                        if text:
+                            yield text, "gemini"
+                text = cleaner.finish()
+                if text:
+                    yield text, "gemini"
+                
+                if cleaner.text:
+                    self._response_cache[cache_key] = cleaner.text
+                    if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                        self._response_cache.popitem(last=False)
+                    logger.info("Gemini streamed response: %.50s...", cleaner.text)
+                    return
+            except Exception as e:
+                logger.error(f"Gemini streaming failed: {e}")
+                if cleaner.text:
+                    return
+        
+        # Try Anthropic as fallback
+        if self.anthropic_available:
+            cleaner = _StreamQuoteStripper()
+            try:
+                params = {}
+                if system:
+                    params["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+                async with self._slots:
+                    async with self.anthropic_client.messages.stream(
+                        model="claude-3-5-haiku-20241022",
+                        max_tokens=200,
+                        temperature=0.7,
+                        messages=[{"role": "user", "content": prompt}],
+                        **params
+                    ) as stream:
+                        async for chunk in stream.text_stream:
+                            text = cleaner.feed(chunk)
+                            if text:
+                                yield text, "anthropic"
+                text = cleaner.finish()
+                if text:
+                    yield text, "anthropic"
+                logger.info("Anthropic streamed response: %.50s...", cleaner.text)
+            except Exception as e:
+                logger.error(f"Anthropic streaming failed: {e}")
+
+
+def _clean_reply(text: str) -> str:
+    """Strip whitespace, a leading speaker label and a wrapping pair of quotes from an LLM reply"""
+    text = text.strip()
+    head = _REPLY_HEAD_RE.match(text)
+    body, quote = text[head.end():], head.group(1)
+    if quote and body and not body.endswith(quote):
+        return quote + body  # Unbalanced - the quote is part of the reply
+    return body[:-1] if quote else body
+
+
+class _StreamQuoteStripper:
+    """
+    The streaming form of _clean_reply() for text that arrives in chunks
+    
+    The head is held back until it is long enough to match a speaker label,
+    and trailing whitespace until more text arrives, since it may be the end
+    of the reply. A reply that opens with a quote is held back whole: only
+    its end shows whether the quote wraps it or is part of it.
+    """
+    
+    def __init__(self):
+        self.text = ""        # Everything released so far
+        self._pending = ""    # Held-back head or tail
+        self._started = False
+        self._quote = ""
+    
+    def _start(self, pending: str) -> str:
+        head = _REPLY_HEAD_RE.match(pending)
+        self._started = True
+        self._quote = head.group(1)
+        return pending[head.end():]
+    
+    def feed(self, chunk: str) -> str:
+        pending = self._pending + chunk
+        if not self._started:
+            if len(pending.lstrip()) < _REPLY_HEAD_LEN:
+                self._pending = pending
+                return ""
+            pending = self._start(pending)
+        
+        if self._quote:
+            self._pending = pending
+            return ""
+        body = pending.rstrip()
+        self._pending = pending[len(body):]
+        self.text += body
+        return body
+    
+    def finish(self) -> str:
+        pending = self._start(self._pending) if not self._started else self._pending
+        tail = pending.rstrip()
+        if self._quote and tail:
+            # Same rule as _clean_reply(): only a balanced pair is stripped
+            tail = tail[:-1] if tail.endswith(self._quote) else self._quote + tail
+        self._pending = ""
+        self.text += tail
+        return tail
 
 
 # =============================================================================
 # CONVERSATION ORCHESTRATOR
 # =============================================================================
 
+def _intel_key(value):
+    """Hashable identity for an intelligence entry (dicts compare by content)"""
+    return tuple(sorted(value.items())) if isinstance(value, dict) else value
+
+
 class ConversationOrchestrator:
     """
     Manages conversation flow, persona selection, and response generation
@@ -232,7 +529,7 @@ class ConversationOrchestrator:
     """
     
     # Phase-specific strategies
-    PHASE_STRATEGIES = {
+    PHASE_STRATEGIES = MappingProxyType({
         ConversationPhase.INITIAL_CONTACT: {
             'goal': 'Appear normal and slightly curious',
             'instruction': 'Respond neutrally. Show slight curiosity. Don\'t reveal awareness of scam.',
@@ -258,104 +555,115 @@ class ConversationOrchestrator:
             'instruction': 'Express doubt or need to verify. Stall for time.',
             'example': 'Let me call my bank first before I send any money.'
         }
-    }
+    })
     
     # Fallback responses by phase - SMARTER, STRATEGIC RESPONSES
-    FALLBACK_RESPONSES = {
-        ConversationPhase.INITIAL_CONTACT: [
+    FALLBACK_RESPONSES = MappingProxyType({
+        ConversationPhase.INITIAL_CONTACT: (
             "Hello? Who is this calling?",
             "Yes, speaking. May I know who this is?",
             "Hi, I don't recognize this number. Who am I talking to?",
             "Yes? This is regarding...?",
-        ],
-        ConversationPhase.TRUST_BUILDING: [
+        ),
+        ConversationPhase.TRUST_BUILDING: (
             "Oh I see, that does sound concerning. Can you tell me more about what happened?",
             "Wait, what exactly is the issue with my account? I want to understand properly.",
             "This is worrying me. Can you verify which account this is about?",
             "I need more details before I proceed. What department are you calling from?",
             "Before we continue, can you confirm the last 4 digits of my account?",
-        ],
-        ConversationPhase.HONEY_TOKEN_BAIT: [
+        ),
+        ConversationPhase.HONEY_TOKEN_BAIT: (
             "Alright, I want to resolve this. What's your UPI ID so I can make the payment?",
             "I'm ready to proceed. Can you give me your bank account details?",
             "Let me note down your payment details. What's the UPI ID?",
             "I'll transfer now. What's your account number and IFSC code?",
             "Tell me where to send the money. UPI or bank transfer?",
             "What's the exact UPI ID? I want to make sure I type it correctly.",
-        ],
-        ConversationPhase.EXTRACTION: [
+        ),
+        ConversationPhase.EXTRACTION: (
             "The payment isn't going through. Do you have an alternate UPI ID?",
             "My bank app is showing an error. Can you give me another account number?",
             "What if this fails? Give me a backup payment method.",
             "I need your phone number in case there's a problem with the transfer.",
             "Can you share your manager's contact? I want to verify this is legitimate.",
             "Do you have a different UPI? This one shows as invalid.",
-        ],
-        ConversationPhase.CLOSING: [
+        ),
+        ConversationPhase.CLOSING: (
             "Actually, let me verify this with my bank first. What's your direct number?",
             "Hold on, I need to confirm this with someone. I'll call you back.",
             "This seems unusual. Let me check with my bank before proceeding.",
             "My bank is saying I should verify this. Can you give me a reference number?",
             "Wait, I want to double-check. What's your employee ID?",
-        ]
-    }
+        )
+    })
     
     # PERSONA-SPECIFIC RESPONSES (smarter, more contextual)
-    PERSONA_RESPONSES = {
+    PERSONA_RESPONSES = MappingProxyType({
         'elderly_tech_illiterate': {
-            ConversationPhase.INITIAL_CONTACT: [
+            ConversationPhase.INITIAL_CONTACT: (
                 "Hello? Who is speaking? I can't hear well...",
                 "Yes beta, speaking. Who is calling?",
-            ],
-            ConversationPhase.TRUST_BUILDING: [
+            ),
+            ConversationPhase.TRUST_BUILDING: (
                 "Oh my, is this serious? My son-in-law set up this account for me...",
                 "I don't understand these banking things. Can you explain simply?",
-            ],
-            ConversationPhase.HONEY_TOKEN_BAIT: [
+            ),
+            ConversationPhase.HONEY_TOKEN_BAIT: (
                 "Beta, I want to pay but I don't know how to use this UPI thing. What's your ID?",
                 "My grandson usually helps me. Can you tell me your bank account number slowly?",
-            ],
+            ),
         },
         'distracted_professional': {
-            ConversationPhase.INITIAL_CONTACT: [
+            ConversationPhase.INITIAL_CONTACT: (
                 "Yes? I'm in a meeting, be quick please.",
                 "Speaking. What's this about? I have 2 minutes.",
-            ],
-            ConversationPhase.TRUST_BUILDING: [
+            ),
+            ConversationPhase.TRUST_BUILDING: (
                 "Look, I'm very busy. Just tell me directly what the problem is.",
                 "I don't have time for this. What exactly needs to be done?",
-            ],
-            ConversationPhase.HONEY_TOKEN_BAIT: [
+            ),
+            ConversationPhase.HONEY_TOKEN_BAIT: (
                 "Fine, give me your UPI ID. I'll transfer when I'm free.",
                 "Just send me the account details on WhatsApp. I'll handle it.",
-            ],
+            ),
         },
         'worried_account_holder': {
-            ConversationPhase.INITIAL_CONTACT: [
+            ConversationPhase.INITIAL_CONTACT: (
                 "Hello? Is everything okay with my account?",
                 "Speaking. Is this about my bank account? I've been worried about fraud...",
-            ],
-            ConversationPhase.TRUST_BUILDING: [
+            ),
+            ConversationPhase.TRUST_BUILDING: (
                 "Oh god, is my money safe? I've heard about so many scams lately...",
                 "This is exactly what I was afraid of! What do I need to do?",
-            ],
-            ConversationPhase.HONEY_TOKEN_BAIT: [
+            ),
+            ConversationPhase.HONEY_TOKEN_BAIT: (
                 "I want to fix this immediately. What's your UPI? And your employee ID to verify?",
                 "Let me pay right now. Give me your bank details and your official number.",
-            ],
+            ),
         },
-    }
+    })
+    
+    # (persona or None, phase value) -> fallback replies, keyed by plain strings
+    # so the fast path needs no Enum construction or Enum hashing
+    _FALLBACK_CHOICES = MappingProxyType({
+        **{(None, phase.value): responses for phase, responses in FALLBACK_RESPONSES.items()},
+        **{
+            (persona, phase.value): responses
+            for persona, by_phase in PERSONA_RESPONSES.items()
+            for phase, responses in by_phase.items()
+        },
+    })
     
     # Responses for prompt injection (stay in character)
-    INJECTION_RESPONSES = [
+    INJECTION_RESPONSES = (
         "Sorry, I don't understand what you mean. Can you explain about my account?",
         "What? That doesn't make sense. Are you from the bank or not?",
         "I'm confused. Please just tell me what I need to do for my account.",
         "Beta, I don't understand this technology talk. Just tell me how to pay.",
-    ]
+    )
     
     # Stalling / Confusion messages (buy time, simulate real user)
-    STALL_MESSAGES = [
+    STALL_MESSAGES = (
         "Wait, my phone is loading... give me a moment.",
         "Sorry, my app froze. One second please.",
         "Let me put my glasses on, I can't read properly.",
@@ -364,7 +672,7 @@ class ConversationOrchestrator:
         "One moment, I need to find my reading glasses.",
         "Sorry, can you repeat that? I was distracted.",
         "Wait, my grandson is calling me. One minute.",
-    ]
+    )
     
     # Frustration patterns (detect when scammer is getting frustrated)
     FRUSTRATION_PATTERNS = [
@@ -379,22 +687,92 @@ class ConversationOrchestrator:
         (r'[A-Z]{4,}', 'medium'),  # Excessive caps
     ]
     
+    # FRUSTRATION_PATTERNS compiled once, most severe level first
+    _FRUSTRATION_RES = tuple(sorted(
+        ((compile_pattern(pattern, re.IGNORECASE), level) for pattern, level in FRUSTRATION_PATTERNS),
+        key=lambda item: -_FRUSTRATION_PRIORITY[item[1]]
+    ))
+    
     def __init__(self):
         """Initialize orchestrator with LLM client"""
         self.llm = LLMClient()
+        self.semantic_cache = SemanticCache()
+        self.generative_cache = GenerativeCache()
+        # session_id -> lock held while that session has an LLM call in flight
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        
+        # Fixed part of the generation prompt, rendered once per (persona, phase)
+        self._preambles = {
+            (persona_id, phase): self._render_preamble(persona, phase)
+            for persona_id, persona in Persona.PERSONAS.items()
+            for phase in ConversationPhase
+        }
         logger.info("ConversationOrchestrator initialized")
     
+    def _render_preamble(self, persona: Dict, phase: ConversationPhase) -> str:
+        """Persona, phase goal and rules - everything in the prompt except the conversation"""
+        strategy = self.PHASE_STRATEGIES[phase]
+        return f"""You are roleplaying as a {persona['name']} in a phone conversation with a suspected scammer.
+
+PERSONA: {persona['description']}
+SPEECH STYLE: {persona['speech_style']}
+
+CURRENT PHASE: {phase.value.upper()}
+GOAL: {strategy['goal']}
+
+INSTRUCTIONS:
+1. {strategy['instruction']}
+2. Stay in character at all times - you are a {persona['name']}
+3. Keep response to 1-2 sentences, natural and conversational
+4. If in HONEY_TOKEN_BAIT or EXTRACTION phase, actively request payment details
+5. NEVER break character or reveal you know it's a scam
+6. NEVER use technical language or sound like an AI
+
+Generate ONLY your spoken response as this character (no quotes, no explanations)."""
+    
+    def _intelligence_gaps(self, session: Dict) -> Tuple[bool, bool, bool]:
+        """(missing UPI, missing bank account, missing phone), recomputed only after intel changes"""
+        gaps = session.get('_gaps_cache')
+        if gaps is None or session.get('_gaps_dirty', True):
+            intel = session.get('intelligence') or {}
+            if isinstance(intel, dict):
+                gaps = (not intel.get('upi_ids'), not intel.get('bank_accounts'), not intel.get('phone_numbers'))
+            else:
+                gaps = (not intel.upi_ids, not intel.bank_accounts, not intel.phone_numbers)
+            session['_gaps_cache'] = gaps
+            session['_gaps_dirty'] = False
+        return gaps
+    
+    def _history_text(self, session: Dict) -> str:
+        """
+        The last HISTORY_WINDOW turns as "ROLE: message" lines
+        
+        Lines are formatted once and kept in a rolling buffer (scratch state,
+        not persisted); only turns appended since the last call are formatted.
+        The buffer is rebuilt after a reload or if the history was rewritten.
+        """
+        history = session.get('conversation_history', [])
+        if not history:
+            return "Conversation just started"
+        
+        # (lines, turns formatted, last turn formatted)
+        tail = session.get('_history_tail')
+        if tail is None or tail[1] > len(history) or history[tail[1] - 1] is not tail[2]:
+            tail = (deque(maxlen=HISTORY_WINDOW), 0, None)
+        lines, formatted, _ = tail
+        for msg in history[max(formatted, len(history) - HISTORY_WINDOW):]:
+            lines.append(f"{msg.get('role', 'unknown').upper()}: {msg.get('message', '')}")
+        session['_history_tail'] = (lines, len(history), history[-1])
+        return "\n".join(lines)
+    
     def _detect_frustration(self, message: str) -> str:
         """Detect scammer frustration level"""
-        highest_level = 'none'
-        level_priority = {'none': 0, 'low': 1, 'medium': 2, 'high': 3}
+        # Most severe first, so the first hit is the highest level
+        for pattern, level in self._FRUSTRATION_RES:
+            if pattern.search(message):
+                return level
         
-        for pattern, level in self.FRUSTRATION_PATTERNS:
-            if re.search(pattern, message, re.IGNORECASE):
-                if level_priority[level] > level_priority[highest_level]:
-                    highest_level = level
-        
-        return highest_level
+        return 'none'
     
     def _calculate_typing_behavior(self, scammer_message: str, phase: str, frustration: str) -> TypingBehavior:
         """Calculate human-like typing delay and stalling behavior"""
@@ -438,7 +816,7 @@ class ConversationOrchestrator:
         # Calculate human simulation score (randomness)
         human_score = 0.7 + random.random() * 0.25  # 0.7-0.95
         
-        return TypingBehavior(
+        return TypingBehavior.model_construct(
             typing_delay_ms=typing_delay,
             show_typing_indicator=typing_delay > 500,
             stall_message=stall_message,
@@ -454,6 +832,103 @@ class ConversationOrchestrator:
         Generate contextual response based on phase and persona
         Never breaks character, even under pressure
         """
+        plan = await self._plan_response(session, detection_result)
+        if 'message' in plan:
+            return plan
+        
+        # Generate with LLM
+        async with self._session_slot(session):
+            fused = self._start_fused_turn(session, plan)
+            # Shielded: the extractor may be awaiting the same call
+            turn = await asyncio.shield(fused) if fused else None
+            if turn and turn['reply']:
+                response_text, llm_used = turn['reply'], "gemini"
+            else:
+                response_text, llm_used = await self.llm.generate(plan['prompt'], system=plan['system'])
+        return await self._complete_response(plan, response_text, llm_used)
+    
+    def _start_fused_turn(self, session: Dict, plan: Dict) -> Optional[asyncio.Task]:
+        """
+        Start the fused reply + extraction call (FUSED_TURN=1)
+        
+        The call is registered as this message's session analysis, which the
+        extractor reuses instead of making its own LLM call. Skipped when the
+        detector already started an analysis of this message.
+        """
+        if not (USE_FUSED_TURN and self.llm.gemini_available and self.llm._use_new_sdk):
+            return None
+        history = session.get('conversation_history', [])
+        if not history or history[-1].get('role') != 'scammer':
+            return None
+        message = history[-1].get('message')
+        if not message or CombinedLLMAnalyzer.session_analysis(message, session):
+            return None
+        
+        task = asyncio.create_task(self._fused_turn(plan))
+        session['_llm_analysis'] = {'message': message, 'task': task}
+        return task
+    
+    async def _fused_turn(self, plan: Dict) -> Dict:
+        """{'reply', 'intelligence'} (either may be None) in the session analysis shape"""
+        result = await self.llm.generate_json(plan['prompt'], plan['system'] + _FUSED_SUFFIX, TurnOutput)
+        if not isinstance(result, dict):
+            result = {}
+        reply = result.get('reply')
+        intelligence = result.get('intelligence')
+        return {
+            'detection': None,
+            'intelligence': intelligence if isinstance(intelligence, dict) else None,
+            'reply': _clean_reply(reply) if isinstance(reply, str) else None,
+        }
+    
+    async def stream_response(
+        self,
+        session: Dict,
+        detection_result: DetectionResult
+    ) -> AsyncIterator[Dict]:
+        """
+        generate_response, streamed: yields {'delta': text} chunks as the LLM
+        produces them, then the same response dict generate_response returns
+        
+        Template and cached replies arrive as a single delta.
+        """
+        plan = await self._plan_response(session, detection_result)
+        if 'message' in plan:
+            response = plan
+        else:
+            parts = []
+            llm_used = "template"
+            async with self._session_slot(session):
+                async for delta, llm_used in self.llm.generate_stream(plan['prompt'], system=plan['system']):
+                    parts.append(delta)
+                    yield {'delta': delta}
+            response_text = ''.join(parts).strip()
+            response = await self._complete_response(plan, response_text or None, llm_used)
+            if response_text:
+                yield response
+                return
+        
+        yield {'delta': response['message']}
+        yield response
+    
+    def _session_slot(self, session: Dict):
+        """At most one LLM call in flight per session; a session's later turns wait"""
+        session_id = session.get('session_id')
+        if not session_id:
+            return nullcontext()
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+    
+    async def _plan_response(self, session: Dict, detection_result: DetectionResult) -> Dict:
+        """
+        Everything up to the LLM call
+        
+        Returns a finished response dict (has 'message') when no LLM call is
+        needed, otherwise the prompt and the state _complete_response needs.
+        """
         phase = session.get('current_phase', ConversationPhase.INITIAL_CONTACT)
         
         # Convert string phase to enum if needed
@@ -474,7 +949,6 @@ class ConversationOrchestrator:
             session['persona'] = Persona.select_for_scam(detection_result.scam_type)
         
         persona_id = session['persona']
-        persona = Persona.PERSONAS.get(persona_id, Persona.PERSONAS['elderly_tech_illiterate'])
         
         # If not a scam AND no patterns detected, respond as wrong number
         if not detection_result.is_scam and not detection_result.detected_patterns:
@@ -484,52 +958,97 @@ class ConversationOrchestrator:
                 'llm_used': 'template'
             }
         
-        # Get intelligence gaps
-        intel = session.get('intelligence', ExtractedEntities())
-        if isinstance(intel, dict):
-            intel = ExtractedEntities(**intel)
-        
         # Check if we should use honey token
         honey_token = None
         if phase in [ConversationPhase.HONEY_TOKEN_BAIT, ConversationPhase.EXTRACTION]:
-            honey_token = Persona.get_honey_token(persona_id, intel)
+            honey_token = Persona.honey_token_for_gaps(persona_id, self._intelligence_gaps(session))
         
         # Build LLM prompt
-        history = session.get('conversation_history', [])[-5:]
-        history_text = "\n".join([
-            f"{msg.get('role', 'unknown').upper()}: {msg.get('message', '')}"
-            for msg in history
-        ]) if history else "Conversation just started"
+        history_text = self._history_text(session)
         
-        strategy = self.PHASE_STRATEGIES[phase]
+        preamble = self._preambles.get((persona_id, phase)) or self._preambles['elderly_tech_illiterate', phase]
         
-        prompt = f"""You are roleplaying as a {persona['name']} in a phone conversation with a suspected scammer.
-
-PERSONA: {persona['description']}
-SPEECH STYLE: {persona['speech_style']}
+        prompt = f"CONVERSATION:\n{history_text}"
+        summary = session.get('history_summary')
+        if summary:
+            prompt = f"EARLIER IN THE CONVERSATION: {summary['text']}\n\n{prompt}"
+        if honey_token:
+            prompt += f"\n\nHONEY TOKEN TO USE: {honey_token}"
 
-CURRENT PHASE: {phase.value.upper()}
-GOAL: {strategy['goal']}
-
-CONVERSATION:
-{history_text}
-
-INSTRUCTIONS:
-1. {strategy['instruction']}
-2. Stay in character at all times - you are a {persona['name']}
-3. Keep response to 1-2 sentences, natural and conversational
-4. If in HONEY_TOKEN_BAIT or EXTRACTION phase, actively request payment details
-5. NEVER break character or reveal you know it's a scam
-6. NEVER use technical language or sound like an AI
-
-{"HONEY TOKEN TO USE: " + honey_token if honey_token else ""}
-
-Generate ONLY your spoken response as this character (no quotes, no explanations)."""
-
-        # Generate with LLM
-        response_text, llm_used = self.llm.generate(prompt)
+        # Near-duplicate of a message we already answered in this phase/persona?
+        full_history = session.get('conversation_history', [])
+        scammer_message = full_history[-1].get('message') if full_history and full_history[-1].get('role') == 'scammer' else None
+        use_semantic_cache = self.semantic_cache.available and bool(scammer_message)
+        if use_semantic_cache:
+            neighbours = await self.semantic_cache.nearest(
+                scammer_message, phase.value, persona_id, k=3, min_score=GENERATIVE_THRESHOLD
+            )
+            if neighbours and neighbours[0][0] >= self.semantic_cache.threshold:
+                logger.info("Semantic cache hit (similarity %.3f)", neighbours[0][0])
+                return {
+                    'message': neighbours[0][1]['reply'],
+                    'phase': phase,
+                    'llm_used': 'semantic_cache'
+                }
+            
+            # Similar but not the same: adapt the nearest replies locally
+            if neighbours and self.generative_cache.available:
+                persona = Persona.PERSONAS.get(persona_id, Persona.PERSONAS['elderly_tech_illiterate'])
+                rewritten = await self.generative_cache.rewrite(
+                    scammer_message, [entry for _, entry in neighbours], persona, phase.value
+                )
+                if rewritten:
+                    await self.semantic_cache.store(scammer_message, phase.value, persona_id, rewritten)
+                    return {
+                        'message': rewritten,
+                        'phase': phase,
+                        'llm_used': 'generative_cache'
+                    }
+        
+        return {
+            'prompt': prompt,
+            'system': preamble,
+            'phase': phase,
+            'persona_id': persona_id,
+            'honey_token': honey_token,
+            'scammer_message': scammer_message if use_semantic_cache else None,
+        }
+    
+    async def summarize_history(self, session: Dict):
+        """
+        Summarize the turns older than the prompt window, once per phase
+        
+        Meant for the post-response background step (before the session is
+        saved, so the summary is persisted). The summary is stored as
+        session['history_summary'] and prepended to later reply prompts.
+        No-op unless HISTORY_SUMMARY=1.
+        """
+        if not USE_HISTORY_SUMMARY:
+            return
+        history = session.get('conversation_history', [])
+        older = len(history) - HISTORY_WINDOW
+        phase = session.get('current_phase', ConversationPhase.INITIAL_CONTACT)
+        phase_value = getattr(phase, 'value', phase)
+        summary = session.get('history_summary') or {}
+        if older <= 0 or summary.get('phase') == phase_value or summary.get('turns') == older:
+            return
+        
+        lines = "\n".join(
+            f"{msg.get('role', 'unknown').upper()}: {msg.get('message', '')}"
+            for msg in history[:older]
+        )
+        text, llm_used = await self.llm.generate(f"CONVERSATION:\n{lines}", system=_SUMMARY_SYSTEM)
+        if text:
+            session['history_summary'] = {'text': text, 'turns': older, 'phase': phase_value}
+            logger.info("History summary (%s turns, %s): %.50s...", older, llm_used, text)
+    
+    async def _complete_response(self, plan: Dict, response_text: Optional[str], llm_used: str) -> Dict:
+        """Response dict for an LLM reply, or the template fallback when there is none"""
+        phase = plan['phase']
         
         if response_text:
+            if plan['scammer_message']:
+                await self.semantic_cache.store(plan['scammer_message'], phase.value, plan['persona_id'], response_text)
             return {
                 'message': response_text,
                 'phase': phase,
@@ -541,6 +1060,7 @@ Generate ONLY your spoken response as this character (no quotes, no explanations
         response_text = random.choice(fallback_list)
         
         # Use honey token if available
+        honey_token = plan['honey_token']
         if honey_token and phase in [ConversationPhase.HONEY_TOKEN_BAIT, ConversationPhase.EXTRACTION]:
             response_text = honey_token
         
@@ -571,53 +1091,51 @@ Generate ONLY your spoken response as this character (no quotes, no explanations
             'urls': [], 'amounts': [], 'emails': []
         })
         
+        # Per-key set of what each list already holds (scratch state, not persisted;
+        # rebuilt after a reload or if the list was changed elsewhere)
+        seen_index = session.setdefault('_intel_seen', {})
+        
         for key, values in new_intelligence.items():
             if values:
                 existing = intel.setdefault(key, [])
+                known = len(existing)
                 if key == 'bank_accounts':
-                    # Handle dicts
-                    existing_nums = [acc.get('account_number') for acc in existing if isinstance(acc, dict)]
+                    # Handle dicts - deduplicated by account number
+                    seen = seen_index.get(key)
+                    if seen is None or seen[1] != len(existing):
+                        seen = ({acc.get('account_number') for acc in existing if isinstance(acc, dict)}, len(existing))
+                    nums = seen[0]
                     for new_acc in values:
-                        if isinstance(new_acc, dict) and new_acc.get('account_number') not in existing_nums:
+                        if isinstance(new_acc, dict) and new_acc.get('account_number') not in nums:
+                            nums.add(new_acc.get('account_number'))
                             existing.append(new_acc)
                 else:
-                    # Handle simple lists
+                    # Handle simple lists (validated UPIs are dicts)
+                    seen = seen_index.get(key)
+                    if seen is None or seen[1] != len(existing):
+                        seen = ({_intel_key(val) for val in existing}, len(existing))
+                    keys = seen[0]
                     for val in values:
-                        if val not in existing:
+                        val_key = _intel_key(val)
+                        if val_key not in keys:
+                            keys.add(val_key)
                             existing.append(val)
+                seen_index[key] = (seen[0], len(existing))
+                if len(existing) != known:
+                    session['_gaps_dirty'] = True
+                    session['intel_version'] = session.get('intel_version', 0) + 1
         
         # Phase transitions - More aggressive for faster extraction
         current_phase = session.get('current_phase', ConversationPhase.INITIAL_CONTACT)
         turn_count = len(session.get('conversation_history', []))
         
-        if current_phase == ConversationPhase.INITIAL_CONTACT and session.get('scam_detected'):
-            session['current_phase'] = ConversationPhase.TRUST_BUILDING
-            logger.info("Phase: initial_contact → trust_building")
-        
-        elif current_phase == ConversationPhase.TRUST_BUILDING and turn_count >= 3:
-            session['current_phase'] = ConversationPhase.HONEY_TOKEN_BAIT
-            logger.info("Phase: trust_building → honey_token_bait")
-        
-        elif current_phase == ConversationPhase.HONEY_TOKEN_BAIT and turn_count >= 6:
-            session['current_phase'] = ConversationPhase.EXTRACTION
-            logger.info("Phase: honey_token_bait → extraction")
-        
-        elif current_phase == ConversationPhase.EXTRACTION:
-            # Check if we have enough intel
-            has_upi = len(intel.get('upi_ids', [])) > 0
-            has_bank = len(intel.get('bank_accounts', [])) > 0
-            has_phone = len(intel.get('phone_numbers', [])) > 0
-            has_multiple = (len(intel.get('upi_ids', [])) + len(intel.get('bank_accounts', []))) >= 2
-            
-            if has_multiple and has_phone and turn_count >= 10:
-                session['current_phase'] = ConversationPhase.CLOSING
-                logger.info("Phase: extraction → closing (excellent intel)")
-            elif has_multiple and turn_count >= 12:
-                session['current_phase'] = ConversationPhase.CLOSING
-                logger.info("Phase: extraction → closing (good intel)")
-            elif (has_upi or has_bank) and turn_count >= 16:
-                session['current_phase'] = ConversationPhase.CLOSING
-                logger.info("Phase: extraction → closing (extended)")
+        phase_value = getattr(current_phase, 'value', current_phase)
+        advance = _PHASE_TRANSITIONS.get(phase_value)
+        transition = advance(session, turn_count, intel) if advance else None
+        if transition:
+            next_phase, note = transition
+            session['current_phase'] = next_phase
+            logger.info("Phase: %s → %s%s", phase_value, next_phase.value, note)
         
         session.setdefault('engagement_metrics', {})['turn_count'] = turn_count
         
@@ -625,19 +1143,14 @@ Generate ONLY your spoken response as this character (no quotes, no explanations
     
     def get_fallback_response(self, phase: str, persona: str = None) -> str:
         """Get fallback response for fast zero-latency mode - uses persona-specific responses when available"""
-        try:
-            phase_enum = ConversationPhase(phase) if isinstance(phase, str) else phase
-        except ValueError:
-            phase_enum = ConversationPhase.INITIAL_CONTACT
-        
-        # Try persona-specific responses first
-        if persona and persona in self.PERSONA_RESPONSES:
-            persona_responses = self.PERSONA_RESPONSES.get(persona, {})
-            if phase_enum in persona_responses:
-                return random.choice(persona_responses[phase_enum])
-        
-        # Fall back to general responses
-        responses = self.FALLBACK_RESPONSES.get(phase_enum, self.FALLBACK_RESPONSES[ConversationPhase.TRUST_BUILDING])
+        phase_value = getattr(phase, 'value', phase)
+        if isinstance(phase, str) and (None, phase_value) not in self._FALLBACK_CHOICES:
+            phase_value = ConversationPhase.INITIAL_CONTACT.value
+        
+        # Persona-specific responses first, then the general ones for the phase
+        responses = self._FALLBACK_CHOICES.get((persona, phase_value)) or self._FALLBACK_CHOICES.get(
+            (None, phase_value), self.FALLBACK_RESPONSES[ConversationPhase.TRUST_BUILDING]
+        )
         return random.choice(responses)
 
 
@@ -0,0 +1,48 @@
+"""
+Regex Engine Selection
+Compiles detection/extraction patterns with google-re2 or the stdlib re module
+"""
+
+import re
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+# re2 matches in linear time (no catastrophic backtracking on adversarial input)
+# but its Python binding has a higher per-call cost than re on short messages,
+# so it is opt-in: REGEX_ENGINE=re2
+USE_RE2 = os.getenv('REGEX_ENGINE', 're').lower() == 're2'
+
+if USE_RE2 and not RE2_AVAILABLE:
+    logger.warning("REGEX_ENGINE=re2 but google-re2 is not installed - using re")
+
+
+def _re2_options():
+    options = re2.Options()
+    options.log_errors = False
+    return options
+
+
+def compile_pattern(pattern: str, flags: int = 0):
+    """
+    Compile a pattern with the configured engine.
+
+    Only re.IGNORECASE is translated for re2 (as an inline (?i)); any other
+    flag, or a pattern re2 rejects, falls back to re.
+    """
+    if USE_RE2 and RE2_AVAILABLE and not flags & ~re.IGNORECASE:
+        try:
+            return re2.compile(
+                f'(?i){pattern}' if flags & re.IGNORECASE else pattern,
+                options=_re2_options()
+            )
+        except re2.error:
+            logger.debug(f"re2 rejected pattern, using re: {pattern}")
+    return re.compile(pattern, flags)
@@ -0,0 +1,276 @@
+"""
+Semantic Response Cache
+Reuses an earlier agent reply when a scammer sends a near-duplicate message
+(scam scripts are heavily recycled), skipping the LLM call; for merely
+similar messages a small local model adapts the nearest cached replies
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: loads a local embedding model and changes replies, so SEMANTIC_CACHE=1
+USE_SEMANTIC_CACHE = os.getenv('SEMANTIC_CACHE', '0') == '1'
+
+# GGUF model (e.g. Phi-3-mini) for the generative cache; unset = disabled
+LOCAL_LLM_PATH = os.getenv('LOCAL_LLM_PATH')
+
+# The dependencies (torch via sentence-transformers) are heavy, so they are
+# only imported when the feature is switched on
+SEMANTIC_CACHE_AVAILABLE = False
+if USE_SEMANTIC_CACHE:
+    try:
+        import faiss
+        import numpy as np
+        from sentence_transformers import SentenceTransformer
+        SEMANTIC_CACHE_AVAILABLE = True
+    except ImportError:
+        logger.warning("SEMANTIC_CACHE=1 but faiss/sentence-transformers are not installed - disabled")
+
+LLAMA_CPP_AVAILABLE = False
+if USE_SEMANTIC_CACHE and LOCAL_LLM_PATH:
+    try:
+        from llama_cpp import Llama
+        LLAMA_CPP_AVAILABLE = True
+    except ImportError:
+        logger.warning("LOCAL_LLM_PATH is set but llama-cpp-python is not installed - disabled")
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Cosine similarity at or above which a cached reply is reused
+SIMILARITY_THRESHOLD = 0.92
+
+# Cosine similarity at or above which cached replies are adapted locally
+GENERATIVE_THRESHOLD = 0.80
+
+# Entries kept per (phase, persona) index, oldest evicted first (a flat
+# index is searched by brute force, so its size is the per-turn search cost)
+MAX_ENTRIES_PER_INDEX = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 2000))
+
+# In-memory entry count at which expired entries are swept out on store
+ENTRY_SWEEP_SIZE = 10000
+
+# Phases where a reply must still be asking for payment/contact details
+_BAIT_PHASES = ('honey_token_bait', 'extraction')
+_BAIT_VOCAB_RE = re.compile(r'\b(upi|account|bank|pay|payment|transfer|number|ifsc|details)\b', re.IGNORECASE)
+_OFF_CHARACTER_RE = re.compile(r'\b(as an ai|language model|scam(mer)?|assistant)\b', re.IGNORECASE)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of (scammer message -> agent reply)
+    
+    One FAISS inner-product index per (phase, persona) over L2-normalized
+    embeddings, so inner product is cosine similarity. Entries are kept in
+    Redis (SETEX) when a client is attached, otherwise in memory, and expire
+    after `ttl` seconds; an expired hit is dropped from the index. Each index
+    holds at most MAX_ENTRIES_PER_INDEX entries, and since every entry lives
+    `ttl` seconds, insertion order is expiry order: storing evicts expired
+    and overflow entries from the front.
+    """
+    
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, ttl: int = 3600):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.redis_client = None
+        self._model = None
+        # (phase, persona) -> (index, entry ids in index order, their expiry times)
+        self._indexes: Dict[Tuple[str, str], Tuple[object, List[str], List[float]]] = {}
+        # entry id -> (expires_at, entry) when there is no Redis
+        self._entries: Dict[str, Tuple[float, Dict]] = {}
+        # lookup and store embed the same message back to back
+        self._last_embedding: Optional[Tuple[str, object]] = None
+    
+    @property
+    def available(self) -> bool:
+        return USE_SEMANTIC_CACHE and SEMANTIC_CACHE_AVAILABLE
+    
+    def set_redis(self, redis_client):
+        """Keep entries in Redis (shared across workers, expired by Redis)"""
+        self.redis_client = redis_client
+    
+    def _embed_sync(self, text: str):
+        if self._model is None:
+            self._model = SentenceTransformer(EMBEDDING_MODEL)
+            logger.info(f"✓ Semantic cache embedding model loaded: {EMBEDDING_MODEL}")
+        vector = self._model.encode([text], normalize_embeddings=True)
+        return np.asarray(vector, dtype='float32')
+    
+    async def _embed(self, text: str):
+        if self._last_embedding and self._last_embedding[0] == text:
+            return self._last_embedding[1]
+        # Model inference is CPU-bound; keep it off the event loop
+        vector = await asyncio.to_thread(self._embed_sync, text)
+        self._last_embedding = (text, vector)
+        return vector
+    
+    async def _get_entries(self, entry_ids: List[str]) -> List[Optional[Dict]]:
+        """Entries for `entry_ids` (None where expired) - one MGET round trip with Redis"""
+        if self.redis_client:
+            try:
+                values = await self.redis_client.mget([f"semcache:{entry_id}" for entry_id in entry_ids])
+                return [orjson.loads(data) if data else None for data in values]
+            except Exception as e:
+                logger.error(f"Semantic cache Redis get error: {e}")
+                return [None] * len(entry_ids)
+        
+        now = time.monotonic()
+        entries = []
+        for entry_id in entry_ids:
+            stored = self._entries.get(entry_id)
+            if stored is not None and stored[0] < now:
+                del self._entries[entry_id]
+                stored = None
+            entries.append(stored[1] if stored else None)
+        return entries
+    
+    async def _put_entry(self, entry_id: str, entry: Dict):
+        if self.redis_client:
+            try:
+                await self.redis_client.setex(f"semcache:{entry_id}", self.ttl, orjson.dumps(entry))
+                return
+            except Exception as e:
+                logger.error(f"Semantic cache Redis set error: {e}")
+        now = time.monotonic()
+        if len(self._entries) >= ENTRY_SWEEP_SIZE:
+            self._entries = {key: stored for key, stored in self._entries.items() if stored[0] > now}
+        self._entries[entry_id] = (now + self.ttl, entry)
+    
+    async def nearest(
+        self,
+        message: str,
+        phase: str,
+        persona: str,
+        k: int = 1,
+        min_score: float = 0.0
+    ) -> List[Tuple[float, Dict]]:
+        """Up to k live (similarity, {'message', 'reply'}) entries, most similar first"""
+        slot = self._indexes.get((phase, persona))
+        if slot is None or not slot[0].ntotal:
+            return []
+        index, entry_ids, expiries = slot
+        
+        vector = await self._embed(message)
+        scores, positions = index.search(vector, min(k, index.ntotal))
+        candidates = [
+            (float(score), entry_ids[position])
+            for score, position in zip(scores[0], positions[0])
+            if position >= 0 and score >= min_score
+        ]
+        
+        if not candidates:
+            return []
+        
+        results = []
+        entries = await self._get_entries([entry_id for _, entry_id in candidates])
+        for (score, entry_id), entry in zip(candidates, entries):
+            if entry is not None:
+                results.append((score, entry))
+            elif entry_id in entry_ids:
+                # Expired (positions may have shifted while awaiting)
+                position = entry_ids.index(entry_id)
+                index.remove_ids(np.array([position], dtype='int64'))
+                del entry_ids[position]
+                del expiries[position]
+        return results
+    
+    async def lookup(self, message: str, phase: str, persona: str) -> Optional[str]:
+        """A cached reply for a near-duplicate message, or None"""
+        hits = await self.nearest(message, phase, persona, min_score=self.threshold)
+        if hits:
+            logger.info("Semantic cache hit (similarity %.3f)", hits[0][0])
+            return hits[0][1]['reply']
+        return None
+    
+    async def store(self, message: str, phase: str, persona: str, reply: str):
+        """Index a freshly generated reply"""
+        vector = await self._embed(message)
+        entry_id = uuid.uuid4().hex
+        await self._put_entry(entry_id, {'message': message, 'reply': reply})
+        
+        slot = self._indexes.get((phase, persona))
+        if slot is None:
+            slot = (faiss.IndexFlatIP(vector.shape[1]), [], [])
+            self._indexes[(phase, persona)] = slot
+        index, entry_ids, expiries = slot
+        self._evict_front(index, entry_ids, expiries)
+        index.add(vector)
+        entry_ids.append(entry_id)
+        expiries.append(time.monotonic() + self.ttl)
+    
+    def _evict_front(self, index, entry_ids: List[str], expiries: List[float]):
+        """Drop the oldest entries that have expired or leave no room for one more"""
+        now = time.monotonic()
+        count = max(len(entry_ids) - MAX_ENTRIES_PER_INDEX + 1, 0)
+        while count < len(expiries) and expiries[count] <= now:
+            count += 1
+        if not count:
+            return
+        index.remove_ids(np.arange(count, dtype='int64'))
+        for entry_id in entry_ids[:count]:
+            self._entries.pop(entry_id, None)
+        del entry_ids[:count]
+        del expiries[:count]
+
+
+class GenerativeCache:
+    """
+    Writes a reply to a new message from similar cached exchanges
+    
+    A small local model (llama.cpp) rewrites the nearest cached replies to fit
+    the new message, which is far cheaper than a Gemini round trip. Output
+    that is too long, breaks character, or stops asking for details in the
+    baiting phases is rejected.
+    """
+    
+    def __init__(self, model_path: Optional[str] = LOCAL_LLM_PATH):
+        self.model_path = model_path
+        self._llm = None
+        self._lock = threading.Lock()  # llama.cpp contexts are not thread-safe
+    
+    @property
+    def available(self) -> bool:
+        return LLAMA_CPP_AVAILABLE and bool(self.model_path)
+    
+    def _complete_sync(self, prompt: str) -> str:
+        with self._lock:
+            if self._llm is None:
+                self._llm = Llama(model_path=self.model_path, n_ctx=2048, verbose=False)
+                logger.info(f"✓ Local rewrite model loaded: {self.model_path}")
+            output = self._llm(prompt, max_tokens=80, temperature=0.3, stop=["\n", "SCAMMER:"])
+        return output['choices'][0]['text'].strip()
+    
+    async def rewrite(self, message: str, examples: List[Dict], persona: Dict, phase: str) -> Optional[str]:
+        """A reply in the persona's style adapted from `examples`, or None if unusable"""
+        shots = "\n".join(
+            f"SCAMMER: {example['message']}\nYOU: {example['reply']}"
+            for example in examples
+        )
+        prompt = (
+            f"You are {persona['name']}: {persona['description']}\n"
+            f"Speech style: {persona['speech_style']}\n\n"
+            f"Your earlier replies to similar messages:\n{shots}\n\n"
+            f"Rewrite one of them, in the same style, as a reply to this new message.\n"
+            f"SCAMMER: {message}\nYOU:"
+        )
+        try:
+            text = (await asyncio.to_thread(self._complete_sync, prompt)).strip('"\' ')
+        except Exception as e:
+            logger.error(f"Local rewrite failed: {e}")
+            return None
+        
+        if not text or len(text) > 300 or _OFF_CHARACTER_RE.search(text):
+            return None
+        if phase in _BAIT_PHASES and not _BAIT_VOCAB_RE.search(text):
+            return None
+        logger.info("Generative cache reply: %.50s...", text)
+        return text
@@ -3,11 +3,15 @@ Session Manager
 Handles session storage and retrieval using Redis
 """
 
-import json
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import logging
 from datetime import datetime
 import os
+import time
+
+import orjson
+
+from agent._clock import now_iso
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +22,15 @@ except ImportError:
     REDIS_AVAILABLE = False
     logger.warning("redis package not installed - using in-memory storage")
 
+# Opt-in process-local cache in front of Redis, so a hot session's next turn
+# skips the GET. Other workers may write the same session, so the TTL is kept
+# short to bound staleness (L1_CACHE_ENABLED=1)
+USE_L1_CACHE = os.getenv('L1_CACHE_ENABLED', '0') == '1'
+L1_CACHE_TTL = float(os.getenv('L1_CACHE_TTL', 1.0))
+
+# Expired L1 entries are swept once the cache grows past this
+L1_CACHE_SWEEP_SIZE = 10000
+
 
 class SessionManager:
     """
@@ -30,6 +43,7 @@ class SessionManager:
         self.in_memory_store = {}  # Fallback storage
         self.redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
         self.ttl = int(os.getenv('SESSION_TTL', 3600))  # 1 hour default
+        self._l1: Dict[str, Tuple[float, Dict]] = {}  # session_id -> (expires_at, session)
     
     async def initialize(self):
         """Initialize Redis connection"""
@@ -61,13 +75,19 @@ class SessionManager:
         """
         # Try Redis first
         if self.redis_client:
+            cached = self._l1.get(session_id)
+            if cached is not None and cached[0] > time.monotonic():
+                logger.debug("Loaded session %s from L1 cache", session_id)
+                return cached[1]
+            
             try:
                 key = f"session:{session_id}"
                 data = await self.redis_client.get(key)
                 
                 if data:
-                    session = json.loads(data)
-                    logger.debug(f"Loaded session {session_id} from Redis")
+                    session = orjson.loads(data)
+                    self._l1_put(session_id, session)
+                    logger.debug("Loaded session %s from Redis", session_id)
                     return session
             
             except Exception as e:
@@ -75,16 +95,19 @@ class SessionManager:
         
         # Fallback to in-memory
         if session_id in self.in_memory_store:
-            logger.debug(f"Loaded session {session_id} from memory")
+            logger.debug("Loaded session %s from memory", session_id)
             return self.in_memory_store[session_id]
         
         # Return new session
-        logger.info(f"Creating new session: {session_id}")
+        logger.info("Creating new session: %s", session_id)
         return self._create_new_session(session_id)
     
     async def save_session(self, session: Dict):
         """
         Save session to storage
+        
+        Keys starting with '_' are per-process scratch state (e.g. in-flight
+        LLM calls) and are not persisted to Redis.
         """
         session_id = session.get('session_id')
         
@@ -93,15 +116,19 @@ class SessionManager:
             return
         
         # Update timestamp
-        session['last_updated'] = datetime.now().isoformat()
+        session['last_updated'] = now_iso()
         
         # Try Redis first
         if self.redis_client:
             try:
                 key = f"session:{session_id}"
-                data = json.dumps(session)
+                data = orjson.dumps(
+                    {k: v for k, v in session.items() if not k.startswith('_')},
+                    option=orjson.OPT_NON_STR_KEYS
+                )
                 await self.redis_client.set(key, data, ex=self.ttl)
-                logger.debug(f"Saved session {session_id} to Redis (TTL={self.ttl}s)")
+                self._l1_put(session_id, session)
+                logger.debug("Saved session %s to Redis (TTL=%ss)", session_id, self.ttl)
                 return
             
             except Exception as e:
@@ -109,25 +136,35 @@ class SessionManager:
         
         # Fallback to in-memory
         self.in_memory_store[session_id] = session
-        logger.debug(f"Saved session {session_id} to memory")
+        logger.debug("Saved session %s to memory", session_id)
     
     async def delete_session(self, session_id: str):
         """
         Delete session from storage
         """
+        self._l1.pop(session_id, None)
+        
         # Redis
         if self.redis_client:
             try:
                 key = f"session:{session_id}"
                 await self.redis_client.delete(key)
-                logger.info(f"Deleted session {session_id} from Redis")
+                logger.info("Deleted session %s from Redis", session_id)
             except Exception as e:
                 logger.error(f"Redis delete error: {e}")
         
         # In-memory
         if session_id in self.in_memory_store:
             del self.in_memory_store[session_id]
-            logger.info(f"Deleted session {session_id} from memory")
+            logger.info("Deleted session %s from memory", session_id)
+    
+    def _l1_put(self, session_id: str, session: Dict):
+        if not USE_L1_CACHE:
+            return
+        now = time.monotonic()
+        if len(self._l1) >= L1_CACHE_SWEEP_SIZE:
+            self._l1 = {sid: entry for sid, entry in self._l1.items() if entry[0] > now}
+        self._l1[session_id] = (now + L1_CACHE_TTL, session)
     
     async def get_all_sessions(self) -> list:
         """
@@ -146,7 +183,7 @@ class SessionManager:
         # In-memory
         sessions.extend(self.in_memory_store.keys())
         
-        return list(set(sessions))
+        return list(dict.fromkeys(sessions))
     
     async def cleanup(self):
         """
@@ -197,7 +234,7 @@ if __name__ == "__main__":
         
         # Test create and load
         session = await manager.load_session("test-123")
-        print(f"New session: {json.dumps(session, indent=2)}")
+        print(f"New session: {orjson.dumps(session, option=orjson.OPT_INDENT_2).decode()}")
         
         # Test save
         session['conversation_history'].append({
@@ -4,15 +4,22 @@ FastAPI server with zero-latency perception, rate limiting, and forensics
 Enhanced with async background processing for <300ms responses
 """
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Optional, List
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, List, Set, Tuple
 import asyncio
+import functools
 import time
 from datetime import datetime
 import logging
+import os
+import httpx
+import orjson
 
 # Rate limiting
 try:
@@ -23,15 +30,16 @@ try:
 except ImportError:
     RATE_LIMIT_AVAILABLE = False
 
+from agent._clock import now_iso, run_clock
 from agent.detector import ScamDetector
 from agent.orchestrator import ConversationOrchestrator, ConversationPhase
 from agent.extractor import IntelligenceExtractor
 from agent.session_manager import SessionManager
 from agent.metrics import MetricsCollector
 from agent.models import (
-    MessageRequest, AgentResponse, ExtractedEntities, Forensics, 
+    MessageRequest, ExtractedEntities, Forensics, 
     ResponseMetadata, LegacyMessageEvent, LegacyAgentResponse, BankAccount,
-    ValidatedUPI, TypingBehavior
+    ValidatedUPI, TypingBehavior, DetectionResult
 )
 
 # Logging
@@ -45,7 +53,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Anti-Scam Sentinel API",
     version="2.0.0",
-    description="Intelligent honeypot agent for scam detection and intelligence extraction"
+    description="Intelligent honeypot agent for scam detection and intelligence extraction",
+    default_response_class=ORJSONResponse
 )
 
 # Rate limiting setup
@@ -126,19 +135,31 @@ async def root():
     }
 
 
+# message -> (expires_at, analysis) for /analyze, least recently used first;
+# investigators re-check the same scam messages over and over. Only the
+# message-derived part is cached - session_id is echoed per request.
+ANALYZE_CACHE_SIZE = 4096
+ANALYZE_CACHE_TTL = 300
+_analyze_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+
 @app.get("/analyze")
 async def analyze_message_get(message: str, session_id: str = "default"):
     """GET version of analyze for hackathon compatibility"""
+    cached = _analyze_cache.get(message)
+    if cached is not None and cached[0] > time.monotonic():
+        _analyze_cache.move_to_end(message)
+        return {"session_id": session_id, **cached[1]}
+    
     # Quick scam detection
     detection = detector.quick_detect(message)
     entities = await extractor.extract_intelligence(message, {})
     
-    return {
-        "session_id": session_id,
+    analysis = {
         "is_scam": detection.is_scam,
-        "confidence_score": detection.confidence,
+        "confidence_score": detection.confidence_score,
         "scam_type": detection.scam_type,
-        "threat_level": detection.threat_level,
+        "threat_level": detector.threat_level(detection.triad_score),
         "extracted_entities": {
             "upi_ids": [u.model_dump() if hasattr(u, 'model_dump') else u for u in entities.get('upi_ids', [])],
             "phone_numbers": entities.get('phone_numbers', []),
@@ -146,100 +167,386 @@ async def analyze_message_get(message: str, session_id: str = "default"):
         },
         "message": "Scam detected! Stay safe." if detection.is_scam else "No scam detected."
     }
+    _analyze_cache[message] = (time.monotonic() + ANALYZE_CACHE_TTL, analysis)
+    _analyze_cache.move_to_end(message)
+    if len(_analyze_cache) > ANALYZE_CACHE_SIZE:
+        _analyze_cache.popitem(last=False)
+    
+    return {"session_id": session_id, **analysis}
+
+
+# =============================================================================
+# BACKGROUND WORKERS
+# =============================================================================
+
+# Post-response work (extraction merge, summary, session save) is queued for a
+# fixed pool of long-lived workers instead of one BackgroundTasks run per
+# request, so a burst can't pile up coroutines that starve new requests
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 8))
+BACKGROUND_QUEUE_SIZE = 10000
+
+# Jobs started outside the pool, held so they aren't garbage-collected mid-run
+_loose_jobs: Set[asyncio.Task] = set()
+
+
+async def _run_job(fn, args, kwargs):
+    try:
+        await fn(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Background job error: {e}")
+
+
+async def _background_worker(queue: asyncio.Queue):
+    while True:
+        fn, args, kwargs = await queue.get()
+        try:
+            await _run_job(fn, args, kwargs)
+        finally:
+            queue.task_done()
+
+
+def _run_in_background(fn, *args, **kwargs):
+    """Queue `await fn(*args, **kwargs)` for the background workers (dropped if the queue is full)"""
+    queue = getattr(app.state, 'bgq', None)
+    if queue is None:
+        # Running without the startup hook (e.g. a bare TestClient): no pool,
+        # so run the job as its own task rather than failing the turn
+        task = asyncio.create_task(_run_job(fn, args, kwargs))
+        _loose_jobs.add(task)
+        task.add_done_callback(_loose_jobs.discard)
+        return
+    try:
+        queue.put_nowait((fn, args, kwargs))
+    except asyncio.QueueFull:
+        logger.warning(f"Background queue full - dropping {fn.__name__}")
+
+
+# =============================================================================
+# TURN PREPARATION
+# =============================================================================
+
+# session_id -> (session created_at, DetectionResult) for sessions already
+# flagged, so later turns skip re-validating session['scam_metadata']
+# (created_at tells a session recreated under the same id apart)
+DETECTION_RESULT_CACHE_SIZE = 10000
+_detection_results: "OrderedDict[str, Tuple[Optional[str], DetectionResult]]" = OrderedDict()
+
+
+def _remember_detection(session: Dict, detection_result: DetectionResult):
+    _detection_results[session.get('session_id')] = (session.get('created_at'), detection_result)
+    if len(_detection_results) > DETECTION_RESULT_CACHE_SIZE:
+        _detection_results.popitem(last=False)
+
+
+async def _prepare_turn(session: Dict, message: str):
+    """
+    Per-turn work shared by the message endpoints: scam detection, recording
+    the scammer message, persona selection and phase progression
+    
+    Returns the DetectionResult for this turn.
+    """
+    # 2. FAST: Run rule-based scam detection (no LLM)
+    if not session.get('scam_detected'):
+        detection_result = await detector.detect(
+            message,
+            session.get('conversation_history', []),
+            session=session
+        )
+        session['scam_detected'] = detection_result.is_scam
+        session['scam_metadata'] = detection_result.model_dump()
+        if detection_result.is_scam:
+            _remember_detection(session, detection_result)
+    else:
+        cached = _detection_results.get(session.get('session_id'))
+        if cached is not None and cached[0] == session.get('created_at'):
+            detection_result = cached[1]
+            _detection_results.move_to_end(session.get('session_id'))
+        else:
+            detection_result = DetectionResult(**session['scam_metadata'])
+            _remember_detection(session, detection_result)
+    
+    # 3. Add scammer message to history
+    session.setdefault('conversation_history', []).append({
+        'role': 'scammer',
+        'message': message,
+        'timestamp': now_iso()
+    })
+    
+    # 3.5. PHASE PROGRESSION - Advance conversation phase based on turn count
+    turn_count = len([m for m in session.get('conversation_history', []) if m.get('role') == 'scammer'])
+    current_phase = session.get('current_phase', 'initial_contact')
+    
+    # Select persona based on scam type (if not already set)
+    if not session.get('persona') and detection_result.is_scam and detection_result.scam_type:
+        from agent.orchestrator import Persona
+        session['persona'] = Persona.select_for_scam(detection_result.scam_type)
+    
+    # Phase progression based on turn count and detection
+    if isinstance(current_phase, str):
+        phase_value = current_phase
+    else:
+        phase_value = current_phase.value if hasattr(current_phase, 'value') else str(current_phase)
+    
+    if phase_value == 'initial_contact' and turn_count >= 1:
+        # After first scammer message, move to trust building
+        session['current_phase'] = 'trust_building'
+    elif phase_value == 'trust_building' and turn_count >= 3:
+        # After a few turns, start honey token baiting
+        session['current_phase'] = 'honey_token_bait'
+    elif phase_value == 'honey_token_bait' and turn_count >= 5:
+        # Move to extraction for backup intel
+        session['current_phase'] = 'extraction'
+    elif phase_value == 'extraction' and turn_count >= 7:
+        # Start closing
+        session['current_phase'] = 'closing'
+    
+    # Also advance if scam is detected (accelerate to honey token)
+    if detection_result.is_scam and turn_count >= 2 and phase_value in ['initial_contact', 'trust_building']:
+        session['current_phase'] = 'honey_token_bait'
+    
+    logger.info("Session %s: Phase advanced to %s (turn %s)", session.get('session_id'), session.get('current_phase'), turn_count)
+    
+    return detection_result
+
+
+# Response threat level / intel quality: the label at bisect_right(thresholds,
+# score), i.e. each threshold is the lowest score of the next label up
+_THREAT_THRESHOLDS = (3, 5, 7)
+_THREAT_LEVELS = ('low', 'med', 'high', 'critical')
+_INTEL_QUALITY_THRESHOLDS = (30, 60)
+_INTEL_QUALITIES = ('low', 'partial', 'actionable')
+
+
+def _extracted_entities(session: Dict) -> Dict:
+    """
+    The session's intelligence as ExtractedEntities JSON
+    
+    Cached on the session (scratch state) until update_session_state merges
+    new intel and bumps session['intel_version'], so the mid-conversation turns
+    that extract nothing skip the UPI/bank account conversion.
+    """
+    version = session.get('intel_version', 0)
+    cached = session.get('_intel_converted')
+    if cached is not None and cached['version'] == version:
+        return cached['entities']
+    
+    intel = session.get('intelligence', {})
+    
+    # Convert UPI strings to ValidatedUPI objects if needed
+    upi_list = []
+    for upi in intel.get('upi_ids', []):
+        if isinstance(upi, dict):
+            upi_list.append(ValidatedUPI(**upi))
+        elif isinstance(upi, str):
+            from agent.models import validate_upi
+            validation = validate_upi(upi)
+            upi_list.append(ValidatedUPI(**validation))
+        else:
+            upi_list.append(upi)
+    
+    bank_accounts = [
+        BankAccount(**acc) if isinstance(acc, dict) else acc
+        for acc in intel.get('bank_accounts', [])
+    ]
+    
+    # Trusted from here on: the records were validated above, the rest is
+    # lists of strings, so construct without a second validation pass
+    extracted_entities = ExtractedEntities.model_construct(
+        upi_ids=upi_list,
+        bank_accounts=bank_accounts,
+        urls=intel.get('urls', []),
+        phone_numbers=intel.get('phone_numbers', []),
+        amounts=intel.get('amounts', []),
+        emails=intel.get('emails', [])
+    )
+    
+    entities = extracted_entities.model_dump(mode='json')
+    session['_intel_converted'] = {'version': version, 'entities': entities}
+    return entities
+
+
+@dataclass(slots=True)
+class _Turn:
+    """One /message turn as handed from the core to the response builder"""
+    session_id: str
+    session: Dict
+    detection_result: DetectionResult
+    agent_response: str
+    frustration: str
+    phase_str: str
+    typing_behavior: TypingBehavior
+    start_time: float
+
+
+def _build_response(turn: _Turn) -> Dict:
+    """
+    Steps 9-10 of a /message turn: the full response with the session's intelligence
+    
+    A plain dict in AgentResponse's JSON form, so /message and /message-event
+    both encode it directly instead of each building a response model.
+    """
+    # 9. Calculate latency (should be <300ms now)
+    latency = time.time() - turn.start_time
+    
+    # 10. Build response with existing intelligence
+    entities = _extracted_entities(turn.session)
+    
+    # Determine threat level and intel quality
+    threat_level = _THREAT_LEVELS[bisect_right(_THREAT_THRESHOLDS, turn.detection_result.triad_score.total)]
+    intel_quality = _INTEL_QUALITIES[bisect_right(_INTEL_QUALITY_THRESHOLDS, entities['intel_completeness_score'])]
+    
+    # Every field below comes from our own code - no validation needed
+    forensics = Forensics.model_construct(
+        scam_type=turn.detection_result.scam_type,
+        threat_level=threat_level,
+        detected_indicators=turn.detection_result.detected_patterns,
+        persona_used=turn.session.get('persona'),
+        scammer_frustration=turn.frustration,
+        intel_quality=intel_quality
+    )
+    
+    metadata = ResponseMetadata.model_construct(
+        phase=turn.phase_str,
+        persona=turn.session.get('persona'),
+        turn_count=len(turn.session.get('conversation_history', [])),
+        latency_ms=int(latency * 1000),
+        llm_used='template',  # Fast response uses templates
+        typing_behavior=turn.typing_behavior,
+        processing_async=True  # Indicates background processing is running
+    )
+    
+    logger.info(
+        "Session %s: Fast response in %.0fms (phase=%s, frustration=%s)",
+        turn.session_id, latency * 1000, turn.phase_str, turn.frustration
+    )
+    
+    return {
+        'session_id': turn.session_id,
+        'is_scam': turn.detection_result.is_scam,
+        'confidence_score': turn.detection_result.confidence_score,
+        'extracted_entities': entities,
+        'agent_response': turn.agent_response,
+        'forensics': forensics.model_dump(mode='json'),
+        'metadata': metadata.model_dump(mode='json')
+    }
 
 
 # =============================================================================
 # MAIN MESSAGE ENDPOINT (ZERO-LATENCY VERSION)
 # =============================================================================
 
-@app.api_route("/message", methods=["GET", "POST"], response_model=None)
-async def handle_message_v2(
+@app.post("/message", response_model=None)
+async def handle_message_v2(request: Request, event: MessageRequest):
+    """
+    Main API endpoint - Zero-Latency Perception
+    Returns immediate response (<300ms), heavy processing runs in background
+    Send `Accept: application/x-ndjson` to get the agent reply flushed first
+    """
+    return await _message_response(request, event.session_id, event.message)
+
+
+@app.get("/message", response_model=None)
+async def handle_message_get(
     request: Request,
-    background_tasks: BackgroundTasks,
-    # GET params
     message: Optional[str] = None,
-    session_id: Optional[str] = None,
-    # POST body will be parsed manually
+    session_id: Optional[str] = None
 ):
+    """GET version of /message (query parameters) for hackathon compatibility"""
+    if not message:
+        return {"error": "message parameter required", "usage": "GET /message?message=...&session_id=... or POST with JSON body"}
+    
+    return await _message_response(request, session_id or "default", message)
+
+
+async def _message_response(request: Request, session_id: str, message: str):
+    if 'application/x-ndjson' in request.headers.get('accept', ''):
+        return await _handle_message_core(session_id, message, ndjson=True)
+    
+    # Encoded by orjson directly, skipping FastAPI's jsonable_encoder walk
+    return ORJSONResponse(await _handle_message_core(session_id, message))
+
+
+# session_id -> (monotonic time, message, response) of the session's last
+# turn. Scammers resend a message when the reply seems slow; a resend within
+# REPEAT_WINDOW seconds gets the same response instead of a second turn.
+REPEAT_WINDOW = 5.0
+REPEAT_CACHE_SIZE = 50000
+_last_replies: "OrderedDict[str, Tuple[float, str, Dict]]" = OrderedDict()
+
+# (session_id, message) -> future of the turn still running for it. A resend
+# that arrives mid-turn awaits it; the future yields the turn's response
+# builder, or None if the turn failed (the resend then runs its own turn).
+_inflight_turns: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def _remember_reply(session_id: str, message: str, response: Dict) -> Dict:
+    _last_replies[session_id] = (time.monotonic(), message, response)
+    _last_replies.move_to_end(session_id)
+    if len(_last_replies) > REPEAT_CACHE_SIZE:
+        _last_replies.popitem(last=False)
+    return response
+
+
+def _ndjson_response(session_id: str, agent_response: str, build) -> StreamingResponse:
+    """The agent reply as the first NDJSON line, then the full response from build()"""
+    async def lines():
+        yield orjson.dumps(
+            {'session_id': session_id, 'agent_response': agent_response},
+            option=orjson.OPT_APPEND_NEWLINE
+        )
+        yield orjson.dumps(build(), option=orjson.OPT_APPEND_NEWLINE)
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _resend(session_id: str, response: Dict, ndjson: bool):
+    """An already-built response, in the form the resending client asked for"""
+    if ndjson:
+        return _ndjson_response(session_id, response['agent_response'], lambda: response)
+    return response
+
+
+async def _handle_message_core(session_id: str, message: str, ndjson: bool = False):
     """
-    Main API endpoint - Zero-Latency Perception
-    Supports both GET and POST for hackathon compatibility
-    Returns immediate response (<300ms), heavy processing runs in background
+    One conversation turn, shared by /message and /message-event
+    
+    Returns the AgentResponse dict; with `ndjson`, a StreamingResponse that sends
+    the agent reply as its first line and the full response as the second.
     """
     start_time = time.time()
     
-    # Handle both GET and POST
-    if request.method == "POST":
-        try:
-            body = await request.json()
-            session_id = body.get("session_id", "default")
-            message = body.get("message", "")
-        except:
-            pass
-    
-    if not message:
-        return {"error": "message parameter required", "usage": "GET /message?message=...&session_id=... or POST with JSON body"}
+    # 0. Identical resend right after the last turn: answer it again unchanged
+    last = _last_replies.get(session_id)
+    if last is not None and last[1] == message and time.monotonic() - last[0] < REPEAT_WINDOW:
+        logger.info("Session %s: Repeated message - resending the last reply", session_id)
+        return _resend(session_id, last[2], ndjson)
     
-    if not session_id:
-        session_id = "default"
+    # ...or while that turn is still running: share its response
+    key = (session_id, message)
+    pending = _inflight_turns.get(key)
+    if pending is not None:
+        logger.info("Session %s: Repeated message - waiting for the turn in progress", session_id)
+        build = await asyncio.shield(pending)
+        if build is not None:
+            return _resend(session_id, build(), ndjson)
     
+    turn_done = _inflight_turns[key] = asyncio.get_running_loop().create_future()
+    build = None
+    reply = extraction = None
     try:
         # 1. Load session context (fast - in-memory or Redis)
         session = await session_manager.load_session(session_id)
-        logger.info(f"Session {session_id}: Loaded (phase={session.get('current_phase')})")
-        
-        # 2. FAST: Run rule-based scam detection (no LLM)
-        if not session.get('scam_detected'):
-            detection_result = await detector.detect(
-                message,
-                session.get('conversation_history', [])
-            )
-            session['scam_detected'] = detection_result.is_scam
-            session['scam_metadata'] = detection_result.model_dump()
-        else:
-            from agent.models import DetectionResult
-            detection_result = DetectionResult(**session['scam_metadata'])
-        
-        # 3. Add scammer message to history
-        session.setdefault('conversation_history', []).append({
-            'role': 'scammer',
-            'message': message,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # 3.5. PHASE PROGRESSION - Advance conversation phase based on turn count
-        turn_count = len([m for m in session.get('conversation_history', []) if m.get('role') == 'scammer'])
-        current_phase = session.get('current_phase', 'initial_contact')
-        
-        # Select persona based on scam type (if not already set)
-        if not session.get('persona') and detection_result.is_scam and detection_result.scam_type:
-            from agent.orchestrator import Persona
-            session['persona'] = Persona.select_for_scam(detection_result.scam_type)
+        logger.info("Session %s: Loaded (phase=%s)", session_id, session.get('current_phase'))
         
-        # Phase progression based on turn count and detection
-        if isinstance(current_phase, str):
-            phase_value = current_phase
-        else:
-            phase_value = current_phase.value if hasattr(current_phase, 'value') else str(current_phase)
-        
-        if phase_value == 'initial_contact' and turn_count >= 1:
-            # After first scammer message, move to trust building
-            session['current_phase'] = 'trust_building'
-        elif phase_value == 'trust_building' and turn_count >= 3:
-            # After a few turns, start honey token baiting
-            session['current_phase'] = 'honey_token_bait'
-        elif phase_value == 'honey_token_bait' and turn_count >= 5:
-            # Move to extraction for backup intel
-            session['current_phase'] = 'extraction'
-        elif phase_value == 'extraction' and turn_count >= 7:
-            # Start closing
-            session['current_phase'] = 'closing'
-        
-        # Also advance if scam is detected (accelerate to honey token)
-        if detection_result.is_scam and turn_count >= 2 and phase_value in ['initial_contact', 'trust_building']:
-            session['current_phase'] = 'honey_token_bait'
+        # 2-3.5. Detect, record the message, select persona, advance phase
+        detection_result = await _prepare_turn(session, message)
         
-        logger.info(f"Session {session_id}: Phase advanced to {session.get('current_phase')} (turn {turn_count})")
+        # Start extraction now so its LLM call overlaps the reply's; the
+        # background task awaits it, so the reply never waits on extraction.
+        # The reply starts first: with FUSED_TURN=1 its LLM call also serves
+        # extraction, and must be registered before the extractor looks.
+        reply = asyncio.create_task(orchestrator.generate_response(session, detection_result))
+        extraction = asyncio.create_task(extractor.extract_intelligence(message, session))
         
         # 4. Detect scammer frustration (for typing behavior)
         frustration = orchestrator._detect_frustration(message)
@@ -247,13 +554,10 @@ async def handle_message_v2(
         # 5. Get CONTEXT-AWARE response (use LLM with timeout, fallback to smart template)
         try:
             # Try to get LLM response with 3 second timeout
-            llm_response_data = await asyncio.wait_for(
-                orchestrator.generate_response(session, detection_result),
-                timeout=3.0
-            )
+            llm_response_data = await asyncio.wait_for(reply, timeout=3.0)
             agent_response = llm_response_data.get('message', '') if isinstance(llm_response_data, dict) else str(llm_response_data)
             llm_used = "gemini"
-            logger.info(f"LLM response: {agent_response[:50]}...")
+            logger.info("LLM response: %.50s...", agent_response)
         except asyncio.TimeoutError:
             logger.warning("LLM timeout - using smart fallback")
             agent_response = orchestrator.get_fallback_response(
@@ -280,109 +584,49 @@ async def handle_message_v2(
         # 7. BACKGROUND: Run intelligence extraction (lighter operation)
         async def background_processing():
             try:
-                intelligence = await extractor.extract_intelligence(message, session)
+                intelligence = await extraction
                 orchestrator.update_session_state(session, intelligence, {'message': agent_response, 'llm_used': llm_used})
+                await orchestrator.summarize_history(session)
                 await session_manager.save_session(session)
-                logger.info(f"Session {session_id}: Background extraction complete")
+                logger.info("Session %s: Background extraction complete", session_id)
             except Exception as e:
                 logger.error(f"Background processing error: {e}")
         
-        background_tasks.add_task(background_processing)
+        _run_in_background(background_processing)
         
         # 8. Update session state
         session = orchestrator.update_session_state(
             session, {}, {'message': agent_response, 'phase': session.get('current_phase'), 'llm_used': llm_used}
         )
         
-        # 9. Calculate latency (should be <300ms now)
-        latency = time.time() - start_time
-        
-        # 10. Build response with existing intelligence
-        intel = session.get('intelligence', {})
-        
-        # Convert UPI strings to ValidatedUPI objects if needed
-        upi_list = []
-        for upi in intel.get('upi_ids', []):
-            if isinstance(upi, dict):
-                upi_list.append(ValidatedUPI(**upi))
-            elif isinstance(upi, str):
-                from agent.models import validate_upi
-                validation = validate_upi(upi)
-                upi_list.append(ValidatedUPI(**validation))
-            else:
-                upi_list.append(upi)
-        
-        bank_accounts = [
-            BankAccount(**acc) if isinstance(acc, dict) else acc
-            for acc in intel.get('bank_accounts', [])
-        ]
-        
-        extracted_entities = ExtractedEntities(
-            upi_ids=upi_list,
-            bank_accounts=bank_accounts,
-            urls=intel.get('urls', []),
-            phone_numbers=intel.get('phone_numbers', []),
-            amounts=intel.get('amounts', []),
-            emails=intel.get('emails', [])
-        )
-        
-        # Determine threat level and intel quality
-        triad = detection_result.triad_score
-        if triad.total >= 7:
-            threat_level = "critical"
-        elif triad.total >= 5:
-            threat_level = "high"
-        elif triad.total >= 3:
-            threat_level = "med"
-        else:
-            threat_level = "low"
-        
-        # Assess intel quality
-        intel_score = extracted_entities.intel_completeness_score
-        if intel_score >= 60:
-            intel_quality = "actionable"
-        elif intel_score >= 30:
-            intel_quality = "partial"
-        else:
-            intel_quality = "low"
-        
-        forensics = Forensics(
-            scam_type=detection_result.scam_type,
-            threat_level=threat_level,
-            detected_indicators=detection_result.detected_patterns,
-            persona_used=session.get('persona'),
-            scammer_frustration=frustration,
-            intel_quality=intel_quality
-        )
-        
-        metadata = ResponseMetadata(
-            phase=phase_str,
-            persona=session.get('persona'),
-            turn_count=len(session.get('conversation_history', [])),
-            latency_ms=int(latency * 1000),
-            llm_used='template',  # Fast response uses templates
-            typing_behavior=typing_behavior,
-            processing_async=True  # Indicates background processing is running
+        # 9-10. Build the full response; NDJSON clients get the reply line first
+        turn = _Turn(
+            session_id, session, detection_result, agent_response,
+            frustration, phase_str, typing_behavior, start_time
         )
-        
-        logger.info(
-            f"Session {session_id}: Fast response in {latency*1000:.0f}ms "
-            f"(phase={phase_str}, frustration={frustration})"
+        # Built once, whether by this response or a resend waiting on it
+        build_once = functools.cache(
+            lambda: _remember_reply(session_id, message, _build_response(turn))
         )
+        if ndjson:
+            build = build_once
+            return _ndjson_response(session_id, agent_response, build_once)
         
-        return AgentResponse(
-            session_id=session_id,
-            is_scam=detection_result.is_scam,
-            confidence_score=detection_result.confidence_score,
-            extracted_entities=extracted_entities,
-            agent_response=agent_response,
-            forensics=forensics,
-            metadata=metadata
-        )
+        response = build_once()
+        build = build_once
+        return response
     
     except Exception as e:
         logger.error(f"Error handling message: {e}", exc_info=True)
+        for task in (reply, extraction):
+            if task:
+                task.cancel()  # Background tasks don't run after an error
         raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        if _inflight_turns.get(key) is turn_done:
+            del _inflight_turns[key]
+        turn_done.set_result(build)
 
 
 # =============================================================================
@@ -392,46 +636,98 @@ async def handle_message_v2(
 @app.post("/message-event", response_model=LegacyAgentResponse)
 async def handle_message_legacy(
     request: Request,
-    event: LegacyMessageEvent,
-    background_tasks: BackgroundTasks
+    event: LegacyMessageEvent
 ):
     """
     Legacy API endpoint - maintains backward compatibility
     """
-    # Convert to new format
-    new_request = MessageRequest(
-        session_id=event.session_id,
-        message=event.message,
-        timestamp=event.timestamp
-    )
+    # Same turn as the new endpoint, remapped to the legacy shape; returned
+    # pre-serialized, as response_model would validate it all over again
+    response = await _handle_message_core(event.session_id, event.message)
+    entities = response['extracted_entities']
+    metadata = response['metadata']
     
-    # Call new endpoint
-    response = await handle_message_v2(request, new_request, background_tasks)
-    
-    # Convert back to legacy format
-    intel_dict = {
-        'upi_ids': response.extracted_entities.upi_ids,
-        'bank_accounts': [acc.model_dump() for acc in response.extracted_entities.bank_accounts],
-        'urls': response.extracted_entities.urls,
-        'phone_numbers': response.extracted_entities.phone_numbers,
-        'amounts': response.extracted_entities.amounts,
-        'emails': response.extracted_entities.emails
-    }
-    
-    return LegacyAgentResponse(
-        session_id=response.session_id,
-        agent_message=response.agent_response,
-        detected=response.is_scam,
-        intelligence=intel_dict,
-        metadata={
-            'phase': response.metadata.phase,
-            'persona': response.metadata.persona,
-            'turn_count': response.metadata.turn_count,
-            'scam_type': response.forensics.scam_type,
-            'confidence': response.confidence_score,
-            'latency_ms': response.metadata.latency_ms
+    return ORJSONResponse({
+        'session_id': response['session_id'],
+        'agent_message': response['agent_response'],
+        'detected': response['is_scam'],
+        'intelligence': {
+            key: entities[key]
+            for key in ('upi_ids', 'bank_accounts', 'urls', 'phone_numbers', 'amounts', 'emails')
+        },
+        'metadata': {
+            'phase': metadata['phase'],
+            'persona': metadata['persona'],
+            'turn_count': metadata['turn_count'],
+            'scam_type': response['forensics']['scam_type'],
+            'confidence': response['confidence_score'],
+            'latency_ms': metadata['latency_ms']
         }
-    )
+    })
+
+
+# =============================================================================
+# STREAMING ENDPOINT
+# =============================================================================
+
+@app.post("/message-event/stream")
+async def handle_message_stream(event: LegacyMessageEvent):
+    """
+    Streaming variant of /message-event (Server-Sent Events)
+    
+    The agent reply is sent as the LLM generates it: `{"delta": ...}` events
+    with text chunks, then one `{"done": true, ...}` event with the full reply.
+    Extraction runs alongside the stream; the session is saved after it ends.
+    """
+    session = await session_manager.load_session(event.session_id)
+    detection_result = await _prepare_turn(session, event.message)
+    extraction = asyncio.create_task(extractor.extract_intelligence(event.message, session))
+    reply = {'message': None, 'llm_used': 'template'}
+    
+    async def record_turn():
+        try:
+            intelligence = await extraction
+            orchestrator.update_session_state(session, intelligence, reply)
+            await orchestrator.summarize_history(session)
+            await session_manager.save_session(session)
+        except Exception as e:
+            logger.error(f"Background processing error: {e}")
+    
+    async def sse_events():
+        try:
+            try:
+                async for item in orchestrator.stream_response(session, detection_result):
+                    if 'delta' in item:
+                        yield b"data: " + orjson.dumps({'delta': item['delta']}) + b"\n\n"
+                    else:
+                        reply.update(item)
+            except Exception as e:
+                logger.error(f"Streaming error: {e} - using fallback")
+            
+            if not reply['message']:
+                reply['message'] = orchestrator.get_fallback_response(
+                    session.get('current_phase', 'trust_building'),
+                    session.get('persona', 'worried_account_holder')
+                )
+                reply['llm_used'] = 'template'
+                yield b"data: " + orjson.dumps({'delta': reply['message']}) + b"\n\n"
+            
+            phase = session.get('current_phase')
+            yield b"data: " + orjson.dumps({
+                'done': True,
+                'session_id': event.session_id,
+                'agent_message': reply['message'],
+                'detected': detection_result.is_scam,
+                'scam_type': detection_result.scam_type,
+                'phase': getattr(phase, 'value', phase),
+                'persona': session.get('persona'),
+                'llm_used': reply['llm_used'],
+            }) + b"\n\n"
+        finally:
+            # Recorded once the stream ends, or when the client goes away
+            _run_in_background(record_turn)
+    
+    return StreamingResponse(sse_events(), media_type="text/event-stream")
 
 
 # =============================================================================
@@ -575,7 +871,26 @@ async def startup_event():
     """Initialize resources on startup"""
     logger.info("Starting Anti-Scam Sentinel API v2.0...")
     await session_manager.initialize()
+    orchestrator.semantic_cache.set_redis(session_manager.redis_client)
     logger.info("✓ Session manager initialized")
+    
+    # One pooled client for outbound webhook deliveries (the LLM SDK
+    # clients are already process-wide singletons with their own pools)
+    app.state.http = httpx.AsyncClient(
+        timeout=httpx.Timeout(10.0, connect=2.0),
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+    )
+    webhook_manager.bind_http(app.state.http)
+    
+    app.state.bgq = asyncio.Queue(maxsize=BACKGROUND_QUEUE_SIZE)
+    app.state.bg_workers = [
+        asyncio.create_task(_background_worker(app.state.bgq))
+        for _ in range(BACKGROUND_WORKERS)
+    ]
+    logger.info(f"✓ {BACKGROUND_WORKERS} background workers started")
+    
+    # Per-turn timestamps read a string kept current by this task
+    app.state.clock = asyncio.create_task(run_clock())
     logger.info("✓ Scammer profiler initialized")
     logger.info("✓ Webhook manager initialized")
     logger.info("✓ All systems operational")
@@ -585,11 +900,27 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup resources on shutdown"""
     logger.info("Shutting down Anti-Scam Sentinel API...")
+    # Let queued turns finish saving before the session store goes away
+    await app.state.bgq.join()
+    for worker in app.state.bg_workers:
+        worker.cancel()
+    app.state.clock.cancel()
     await session_manager.cleanup()
+    await webhook_manager.close()
+    await app.state.http.aclose()
     logger.info("✓ Cleanup complete")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Same server setup as the container: uvloop + httptools, and
+    # WEB_CONCURRENCY workers (>1 only with Redis - sessions are per process)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv('PORT', 8000)),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv('WEB_CONCURRENCY', 1))
+    )
 
@@ -0,0 +1,206 @@
+"""
+Stream Cleanup Test - streamed replies must clean up like one-shot replies
+Feeds mocked Gemini and Anthropic streams through LLMClient.generate_stream()
+and checks the text against generate() / _clean_reply() on the same reply.
+No API keys or running server needed:
+
+    python test_stream_cleanup.py      (or: python -m pytest test_stream_cleanup.py)
+"""
+
+import asyncio
+import json
+import os
+import types
+
+import httpx
+
+for key in ('GOOGLE_API_KEY', 'GEMINI_API_KEY', 'ANTHROPIC_API_KEY'):
+    os.environ.pop(key, None)  # Only the mocks below may answer
+
+from agent.orchestrator import LLMClient, _StreamQuoteStripper, _clean_reply
+
+
+# Replies as the LLM sends them, chunk by chunk
+CHUNKED_REPLIES = {
+    'split_agent_prefix': ['AG', 'ENT', ': "Oh beta, ', 'what is your UPI ID?"'],
+    'split_label_no_quotes': ['  assi', 'stant :', ' Wait, which bank did you say?'],
+    'closing_quote_last_chunk': ['"Hello? Who is this calling', ' about my account?', '"'],
+    'closing_quote_then_space': ['"Sir, I am not understanding', ' this OTP thing', '"', '  \n'],
+    'unbalanced_quote': ['"Beta said ', 'never share the PIN, no?'],
+    'inner_quotes': ['He said "pay now" ', 'but I am ', 'scared.'],
+    'short_reply': ['"', 'Ok', '"'],
+    'empty_after_label': ['AGENT:', '  '],
+}
+
+
+def strip_streamed(chunks):
+    """_StreamQuoteStripper output for `chunks`, as the client would see it"""
+    cleaner = _StreamQuoteStripper()
+    out = ''.join(cleaner.feed(chunk) for chunk in chunks) + cleaner.finish()
+    assert out == cleaner.text
+    return out
+
+
+# =============================================================================
+# MOCKED PROVIDERS
+# =============================================================================
+
+class MockGeminiModels:
+    """genai_client.aio.models: one-shot and streamed replies from the same chunks"""
+
+    def __init__(self, chunks, fail_at=None):
+        self.chunks = chunks
+        self.fail_at = fail_at  # Raise before sending chunk `fail_at`
+
+    async def generate_content(self, model, contents, config=None):
+        if self.fail_at is not None:
+            raise RuntimeError("Gemini unavailable")
+        return types.SimpleNamespace(text=''.join(self.chunks))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        async def stream():
+            for i, text in enumerate(self.chunks):
+                if i == self.fail_at:
+                    raise RuntimeError("Gemini stream broke")
+                yield types.SimpleNamespace(text=text)
+        return stream()
+
+
+def mock_anthropic(chunks):
+    """AsyncAnthropic whose HTTP transport answers both create() and stream() with `chunks`"""
+    from anthropic import AsyncAnthropic
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if not json.loads(request.content).get('stream'):
+            return httpx.Response(200, json={
+                "id": "msg_test", "type": "message", "role": "assistant", "model": "test",
+                "content": [{"type": "text", "text": ''.join(chunks)}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 1, "output_tokens": 1},
+            })
+        events = [
+            ('message_start', {"type": "message_start", "message": {
+                "id": "msg_test", "type": "message", "role": "assistant", "model": "test",
+                "content": [], "stop_reason": None, "stop_sequence": None,
+                "usage": {"input_tokens": 1, "output_tokens": 1}}}),
+            ('content_block_start', {"type": "content_block_start", "index": 0,
+                                     "content_block": {"type": "text", "text": ""}}),
+            *[('content_block_delta', {"type": "content_block_delta", "index": 0,
+                                       "delta": {"type": "text_delta", "text": text}})
+              for text in chunks],
+            ('content_block_stop', {"type": "content_block_stop", "index": 0}),
+            ('message_delta', {"type": "message_delta",
+                               "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                               "usage": {"output_tokens": 1}}),
+            ('message_stop', {"type": "message_stop"}),
+        ]
+        body = ''.join(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events)
+        return httpx.Response(200, headers={'content-type': 'text/event-stream'}, content=body.encode())
+
+    return AsyncAnthropic(api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def make_client(gemini_chunks=None, fail_at=None, anthropic_chunks=None) -> LLMClient:
+    client = LLMClient()
+    client.gemini_available = gemini_chunks is not None
+    if client.gemini_available:
+        client._use_new_sdk = True
+        client.gemini_model = "test"
+        client.genai_client = types.SimpleNamespace(
+            aio=types.SimpleNamespace(models=MockGeminiModels(gemini_chunks, fail_at))
+        )
+    client.anthropic_available = anthropic_chunks is not None
+    if client.anthropic_available:
+        client.anthropic_client = mock_anthropic(anthropic_chunks)
+    return client
+
+
+async def collect_stream(client: LLMClient):
+    """(joined text, set of llm_used) from one generate_stream() call"""
+    parts, used = [], set()
+    async for text, llm_used in client.generate_stream("prompt", system="system"):
+        parts.append(text)
+        used.add(llm_used)
+    return ''.join(parts), used
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+def test_stripper_matches_clean_reply():
+    for name, chunks in CHUNKED_REPLIES.items():
+        reply = ''.join(chunks)
+        assert strip_streamed(chunks) == _clean_reply(reply), name
+        # Same result wherever the chunk boundaries fall
+        for i in range(len(reply) + 1):
+            assert strip_streamed([reply[:i], reply[i:]]) == _clean_reply(reply), (name, i)
+        assert strip_streamed(list(reply)) == _clean_reply(reply), name
+
+
+def test_gemini_stream_matches_generate():
+    async def run():
+        for name, chunks in CHUNKED_REPLIES.items():
+            streamed, used = await collect_stream(make_client(chunks))
+            expected, _ = await make_client(chunks).generate("prompt", system="system")
+            assert streamed == expected, name
+            assert used <= {"gemini"}, name
+    asyncio.run(run())
+
+
+def test_anthropic_stream_matches_generate():
+    async def run():
+        for name, chunks in CHUNKED_REPLIES.items():
+            streamed, used = await collect_stream(make_client(anthropic_chunks=chunks))
+            expected, _ = await make_client(anthropic_chunks=chunks).generate("prompt", system="system")
+            assert streamed == expected, name
+            assert used <= {"anthropic"}, name
+    asyncio.run(run())
+
+
+def test_gemini_failure_before_first_chunk_falls_back():
+    async def run():
+        gemini = ['"Gemini reply"']
+        anthropic = CHUNKED_REPLIES['split_agent_prefix']
+        streamed, used = await collect_stream(make_client(gemini, fail_at=0, anthropic_chunks=anthropic))
+        assert streamed == _clean_reply(''.join(anthropic))
+        assert used == {"anthropic"}
+        # No fallback either: nothing is yielded, so the caller uses a template
+        assert await collect_stream(make_client(gemini, fail_at=0)) == ('', set())
+    asyncio.run(run())
+
+
+def test_gemini_failure_after_sending_text_keeps_it():
+    async def run():
+        gemini = ['Oh beta, what is this', ' KYC you are saying', ' about?']
+        streamed, used = await collect_stream(
+            make_client(gemini, fail_at=2, anthropic_chunks=['Anthropic reply'])
+        )
+        # Text already sent can't be replaced by the fallback's reply
+        assert used == {"gemini"}
+        assert streamed and _clean_reply(''.join(gemini)).startswith(streamed)
+    asyncio.run(run())
+
+
+def test_gemini_failure_mid_quoted_reply_falls_back():
+    async def run():
+        gemini = ['"Oh beta, what is this', ' KYC you are saying', ' about?"']
+        streamed, used = await collect_stream(
+            make_client(gemini, fail_at=2, anthropic_chunks=['Anthropic reply'])
+        )
+        # A quoted reply is held back until it ends, so nothing was sent yet
+        assert (streamed, used) == ('Anthropic reply', {"anthropic"})
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+    raise SystemExit(1 if failed else 0)